@@ -1,23 +1,44 @@
+import hashlib
 import streamlit as st
-from finance.config import APP_NAME
+from finance.config import APP_NAME, TENANT_DIR, DEFAULT_TENANT
 from finance.db import FinanceDb
+from finance.backup import schedule_backups
 from finance.repository import FinanceRep
 from finance.services import FinanceService
 from finance.ai import AiService
+from finance.metrics import begin_run
 from ui.theme import inject_theme
 from ui.menu import render_menu
-from ui.views import show_filters, display_kpis, show_finance_insights, all_tabs
+from ui.views import show_filters, display_kpis, show_finance_insights, all_tabs, debug_panel
+
+def tenant_id() -> str:
+    # signed-in users get their own shard; anonymous visitors all share the default one
+    # (a URL parameter would let anyone open any tenant's data)
+    user = getattr(st, "user", None)
+    if user is not None and user.get("is_logged_in") and user.get("email"):
+        return hashlib.sha1(user["email"].lower().encode()).hexdigest()[:16]
+    return DEFAULT_TENANT
+
+def open_db() -> FinanceDb:
+    if not TENANT_DIR:
+        return FinanceDb()
+    try:
+        return FinanceDb.for_tenant(tenant_id())
+    except ValueError as e:
+        st.error(str(e)); st.stop()
 
 def main():
+    run = begin_run()  # no-op unless FINANCE_PROFILE=1
     st.set_page_config(page_title=APP_NAME, page_icon="💰", layout="wide", initial_sidebar_state="expanded")
     inject_theme() 
 
     # --- infra / services ---
-    db = FinanceDb()
+    db = open_db()
     db.init_db()
+    db.once("backup", lambda: schedule_backups(db))  # no-op unless BACKUP_INTERVAL_SECS > 0
     repo = FinanceRep(db)
     service = FinanceService(repo)
-    ai = AiService()
+    ai = AiService(db)
 
     st.title(APP_NAME)
    
@@ -27,15 +48,16 @@ def main():
         render_menu(repo, service, ai)  
 
     # Filters
-    start, end, typ, cat_ids = show_filters(repo)
-    df = repo.get_trans(start, end, typ, cat_ids)
+    filters, search = show_filters(repo)
 
-    # KPIs + finance_insights
-    display_kpis(service, df)
-    show_finance_insights(service, df)
+    # KPIs + finance_insights (aggregated in SQLite)
+    display_kpis(service, filters)
+    show_finance_insights(service, filters)
 
     # Tabs (Charts / Transactions / AI Advice)
-    all_tabs(repo, service, ai, df)
+    all_tabs(repo, service, ai, filters, search)
+
+    debug_panel(run)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+def check(results: Dict[str, Dict], thresholds: Dict, baseline: Optional[Dict]) -> List[Dict]:
+    failures = []
+    for name, limit in thresholds.get("max_ms", {}).items():
+        got = results.get(name)
+        if got and got["median_ms"] > limit:
+            failures.append({"case": name, "median_ms": got["median_ms"], "limit_ms": limit, "reason": "threshold"})
+    if baseline:
+        ratio = thresholds.get("max_regression", 1.5)
+        floor = thresholds.get("min_delta_ms", 5)  # ignore jitter on millisecond-scale cases
+        for name, prev in baseline.get("cases", {}).items():
+            got = results.get(name)
+            if got and prev["median_ms"] > 0 and got["median_ms"] > prev["median_ms"] * ratio \
+                    and got["median_ms"] - prev["median_ms"] > floor:
+                failures.append({"case": name, "median_ms": got["median_ms"], "baseline_ms": prev["median_ms"],
+                                 "ratio": round(got["median_ms"] / prev["median_ms"], 2), "reason": "regression"})
+    return failures
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the finance tracker on synthetic data.")
+    p.add_argument("--db", default="bench.db", help="benchmark database file (default: %(default)s)")
+    p.add_argument("--transactions", type=int, default=100_000, help="rows to generate, 10k to 10M")
+    p.add_argument("--categories", type=int, default=200)
+    p.add_argument("--years", type=int, default=5)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--reuse", action="store_true", help="benchmark an existing --db instead of regenerating it")
+    p.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    p.add_argument("--app-runs", type=int, default=5, help="app.main reruns to time (0 to skip)")
+    p.add_argument("--write-threads", type=int, default=8, help="concurrent writer sessions")
+    p.add_argument("--writes", type=int, default=200, help="add_trans calls per session (0 to skip)")
+    p.add_argument("--startup-runs", type=int, default=3, help="fresh-process import + first-run timings (0 to skip)")
+    p.add_argument("--thresholds", default=THRESHOLDS, help="JSON with max_ms per case and max_regression")
+    p.add_argument("--baseline", help="previous results JSON to compare against")
+    p.add_argument("--out", help="write results JSON here as well as stdout")
+    return p
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    db = os.path.abspath(args.db)
+    # app.main opens the default DB_PATH, so point it at the benchmark file before finance is imported
+    os.environ["FINANCE_DB"] = db
+    from .synth import generate
+    from .cases import run_cases, startup, write_throughput
+
+    data = None
+    if not args.reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db + suffix):
+                os.remove(db + suffix)
+        t0 = time.perf_counter()
+        data = generate(db, args.transactions, args.categories, args.years, seed=args.seed)
+        data["seconds"] = round(time.perf_counter() - t0, 2)
+        print(f"generated {data['transactions']:,} transactions in {data['seconds']}s", file=sys.stderr)
+
+    results = run_cases(db, args.repeat, args.app_runs)
+    if args.writes:
+        results.update(write_throughput(db, args.write_threads, args.writes))
+    if args.startup_runs:
+        results.update(startup(args.startup_runs))
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, thresholds, baseline)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+              "machine": platform.machine(), "db": db, "dataset": data,
+              "params": {"transactions": args.transactions, "categories": args.categories, "years": args.years,
+                         "seed": args.seed, "repeat": args.repeat},
+              "cases": results, "failures": failures, "ok": not failures}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
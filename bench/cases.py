@@ -0,0 +1,154 @@
+import datetime as dt
+import json
+import os
+import subprocess
+import sys
+import threading
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+from streamlit.logger import set_log_level
+from finance.db import FinanceDb
+from finance.repository import FinanceRep
+from finance.services import FinanceService
+from finance.ai import AiService
+from ui import charts
+
+# chart functions call st.image outside a script run; silence the "no ScriptRunContext" noise
+set_log_level("error")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def timed(fn: Callable, repeat: int, reset: Callable = lambda: None) -> Dict:
+    samples: List[float] = []
+    rows = None
+    for _ in range(repeat):
+        reset()
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if isinstance(out, pd.DataFrame):
+            rows = len(out)
+    samples.sort()
+    return {"median_ms": round(statistics.median(samples), 3), "min_ms": round(samples[0], 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            "runs": repeat, "rows": rows}
+
+def filter_shapes(repo: FinanceRep) -> Dict[str, Tuple]:
+    today = dt.date.today()
+    cats = repo.list_categories("EXPENSE")["id"].head(3).tolist()
+    return {
+        "all": (None, None, None, None),
+        "last_30d": ((today - dt.timedelta(days=30)).isoformat(), today.isoformat(), None, None),
+        "last_year": ((today - dt.timedelta(days=365)).isoformat(), today.isoformat(), None, None),
+        "expense_only": (None, None, "EXPENSE", None),
+        "three_categories": (None, None, None, cats),
+        "combined": ((today - dt.timedelta(days=365)).isoformat(), today.isoformat(), "EXPENSE", cats),
+    }
+
+def run_cases(path: str, repeat: int, app_runs: int) -> Dict[str, Dict]:
+    db = FinanceDb(path)
+    db.init_db()
+    repo = FinanceRep(db)
+    service = FinanceService(repo)
+    ai = AiService(None)
+    # every case measures the uncached path: the read cache and chart PNG cache start empty
+    cold = lambda: (repo.cache.lru.clear(), charts._PNG_CACHE.clear())
+    shapes = filter_shapes(repo)
+    results: Dict[str, Dict] = {}
+
+    for name, f in shapes.items():
+        results[f"get_trans[{name}]"] = timed(lambda: repo.get_trans(*f), repeat, cold)
+        results[f"get_trans_compact[{name}]"] = timed(lambda: repo.get_trans(*f, compact=True), repeat, cold)
+    for name in ("all", "last_year", "combined"):
+        f = shapes[name]
+        results[f"kpis[{name}]"] = timed(lambda: service.kpis(*f), repeat, cold)
+        results[f"finance_insights[{name}]"] = timed(lambda: service.finance_insights(*f), repeat, cold)
+        results[f"budget_matrix[{name}]"] = timed(lambda: repo.budget_matrix(*f), repeat, cold)
+        results[f"make_prompt[{name}]"] = timed(lambda: ai.make_prompt(service, 3, *f), repeat, cold)
+
+    f = shapes["all"]
+    by_cat = repo.by_category(*f)
+    plot_df = repo.budget_vs_actual(dt.date.today(), *f)
+    budgets = repo.budget_matrix(*f)
+    results["chart.pie_category"] = timed(lambda: charts.pie_category(by_cat), repeat, cold)
+    for res in ("day", "week", "month"):
+        results[f"trend[all, {res}]"] = timed(lambda: repo.trend(*f, resolution=res), repeat, cold)
+    daily = repo.trend(*f, resolution="day")
+    results["chart.trend[day]"] = timed(lambda: charts.trend_chart(daily, "day"), repeat, cold)
+    results["chart.trend[day, native]"] = timed(lambda: charts.trend_chart(daily, "day", native=True), repeat, cold)
+    results["chart.actual_budget"] = timed(lambda: charts.actual_budget(plot_df, dt.date.today()), repeat, cold)
+    results["chart.budget_heatmap"] = timed(lambda: charts.budget_heatmap(budgets), repeat, cold)
+
+    if app_runs:
+        results.update(app_reruns(app_runs))
+    return results
+
+def app_reruns(runs: int) -> Dict[str, Dict]:
+    # AppTest executes app.py in-process against DB_PATH, which the runner points at the benchmark file
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    t0 = time.perf_counter()
+    at.run()
+    first = (time.perf_counter() - t0) * 1000
+    if at.exception:
+        raise RuntimeError(f"app.main failed: {at.exception[0].message}")
+    out = {"app.main[first_run]": {"median_ms": round(first, 3), "min_ms": round(first, 3),
+                                   "p95_ms": round(first, 3), "runs": 1, "rows": None}}
+    out["app.main[rerun]"] = timed(at.run, runs)
+    return out
+
+# measured in a fresh interpreter each time: module imports, then the first full script run
+# (schema check, seed marker, KPIs, default tab) until AppTest returns, i.e. time to first paint
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=600)
+t1 = time.perf_counter()
+at.run()
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - t0) * 1000, "first_run_ms": (done - t1) * 1000,
+                  "heavy": sorted(m for m in ("matplotlib", "google.generativeai") if m in sys.modules)}}))
+"""
+
+def startup(runs: int) -> Dict[str, Dict]:
+    root = os.path.dirname(APP_PATH)
+    script = STARTUP_SCRIPT.format(root=root, app=APP_PATH)
+    imports, first, heavy = [], [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=root)
+        data = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(data["import_ms"]); first.append(data["first_run_ms"]); heavy = data["heavy"]
+    stats = lambda xs: {"median_ms": round(statistics.median(xs), 3), "min_ms": round(min(xs), 3),
+                        "p95_ms": round(max(xs), 3), "runs": runs, "rows": None}
+    return {"startup.import_app": {**stats(imports), "modules_after_first_run": heavy},
+            "startup.first_run": stats(first)}
+
+def write_throughput(path: str, threads: int, per_thread: int) -> Dict[str, Dict]:
+    # concurrent add_trans calls, as from many sessions at once, through the group-commit writer
+    repo = FinanceRep(FinanceDb(path))
+    cat = int(repo.list_categories("EXPENSE")["id"].iloc[0])
+    day = dt.date.today().isoformat()
+    latencies: List[float] = []
+    def session(i: int):
+        for j in range(per_thread):
+            t0 = time.perf_counter()
+            ok, msg = repo.add_trans(day, f"bench write {i}-{j}", 1.0 + j % 50, cat, "EXPENSE")
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                raise RuntimeError(msg)
+    workers = [threading.Thread(target=session, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers: w.start()
+    for w in workers: w.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {f"writes[threads={threads}]": {
+        "median_ms": round(statistics.median(latencies), 3), "min_ms": round(latencies[0], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3), "runs": len(latencies), "rows": None,
+        "writes_per_sec": round(len(latencies) / elapsed, 1), "writer": repo.writer.stats()}}
@@ -0,0 +1,73 @@
+import datetime as dt
+from contextlib import contextmanager
+from typing import Dict
+import numpy as np
+import pandas as pd
+from finance.db import FinanceDb
+from finance.repository import FinanceRep
+
+WORDS = ["store", "market", "online", "monthly", "card", "cafe", "station", "service", "order", "refund",
+         "transfer", "payment", "shop", "city", "express", "daily", "club", "fee", "plan", "deposit"]
+
+@contextmanager
+def bulk_load(conn):
+    # drop the transactions indexes and rollup triggers for the load, then rebuild them once
+    saved = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE tbl_name='transactions' "
+                         "AND sql IS NOT NULL AND type IN ('index','trigger')").fetchall()
+    for typ, name, _ in saved:
+        conn.execute(f"DROP {typ.upper()} {name}")
+    try:
+        yield
+    finally:
+        for _, _, sql in saved:
+            conn.execute(sql)
+
+def generate(path: str, transactions: int = 100_000, categories: int = 200, years: int = 5,
+             budget_share: float = 0.6, seed: int = 42, chunk: int = 500_000) -> Dict[str, int]:
+    rng = np.random.default_rng(seed)
+    db = FinanceDb(path)
+    db.init_db()
+    repo = FinanceRep(db)
+    n_income = max(1, categories // 8)
+    cats = [(f"Income {i:03d}", "INCOME") for i in range(n_income)] + \
+           [(f"Expense {i:03d}", "EXPENSE") for i in range(categories - n_income)]
+    with db.connect() as conn:
+        conn.executemany("INSERT OR IGNORE INTO categories(name, type) VALUES(?, ?)", cats)
+        ids = pd.read_sql_query("SELECT id, name, type FROM categories WHERE name LIKE 'Income %' OR name LIKE 'Expense %' "
+                                "ORDER BY id", conn)
+    inc_ids = ids.loc[ids["type"] == "INCOME", "id"].to_numpy()
+    exp_ids = ids.loc[ids["type"] == "EXPENSE", "id"].to_numpy()
+    # category popularity follows a Zipf-like curve so a few categories dominate, as in real ledgers
+    exp_p = 1.0 / np.arange(1, len(exp_ids) + 1); exp_p /= exp_p.sum()
+    exp_scale = rng.uniform(5, 120, len(exp_ids))
+
+    today = dt.date.today()
+    first = today - dt.timedelta(days=365 * years)
+    span = (today - first).days + 1
+    words = np.array(WORDS)
+    inserted = 0
+    with db.connect() as conn, bulk_load(conn):
+        while inserted < transactions:
+            n = min(chunk, transactions - inserted)
+            income = rng.random(n) < 0.08
+            cat = np.where(income, rng.choice(inc_ids, n), rng.choice(exp_ids, n, p=exp_p))
+            scale = np.where(income, 2500.0, exp_scale[np.searchsorted(exp_ids, cat).clip(0, len(exp_ids) - 1)])
+            cents = np.maximum(1, np.round(rng.lognormal(0, 0.6, n) * scale * 100)).astype(np.int64)
+            days = pd.to_datetime(first) + pd.to_timedelta(rng.integers(0, span, n), unit="D")
+            desc = pd.Series(words[rng.integers(0, len(words), n)]) + " " + pd.Series(words[rng.integers(0, len(words), n)])
+            rows = zip(days.strftime("%Y-%m-%d"), desc, cents.tolist(), cat.tolist(),
+                       np.where(income, "INCOME", "EXPENSE"))
+            conn.executemany("INSERT INTO transactions(date, description, amount_cents, category_id, type) "
+                             "VALUES(?, ?, ?, ?, ?)", rows)
+            inserted += n
+        budgeted = rng.choice(exp_ids, int(len(exp_ids) * budget_share), replace=False)
+        limits = np.round(exp_scale[np.searchsorted(exp_ids, budgeted)] * rng.uniform(5, 40, len(budgeted)), 2)
+        conn.executemany("INSERT INTO budgets(category_id, monthly_limit) VALUES(?, ?) "
+                         "ON CONFLICT(category_id) DO UPDATE SET monthly_limit=excluded.monthly_limit",
+                         zip(budgeted.tolist(), limits.tolist()))
+    rollup = repo.rebuild_rollup()
+    repo.rebuild_search()
+    repo.backfill_fingerprints()
+    with db.connect() as conn:
+        conn.execute("ANALYZE")
+    return {"transactions": inserted, "categories": len(cats), "budgets": len(budgeted), "rollup_rows": rollup}
@@ -1,48 +1,221 @@
 import os
+import re
+import time
+import queue
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
+from typing import Optional, List, Dict, Tuple, Any, Iterator
+from .config import (AI_CACHE_TTL_SECS, AI_CACHE_MAX_ENTRIES, AI_BACKEND, AI_TIMEOUT_SECS,
+                     AI_MAX_CONCURRENCY, AI_MAX_PENDING, AI_LOCAL_DELAY_MS)
+from .db import FinanceDb
 from .services import FinanceService
-from .repository import FinanceRep
-from dotenv import load_dotenv
+from .repository import FinanceRep, is_date_valid
+from .metrics import instrumented
+from .writer import writer_for
 
+ENV_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")  # .env is loaded once by finance.config
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+# google.generativeai takes ~1s to import, so it is loaded on the first advice request
+_GENAI: Any = None
+_GENAI_LOCK = threading.Lock()
 
-load_dotenv()
-ENV_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+def load_genai():
+    global _GENAI
+    with _GENAI_LOCK:
+        if _GENAI is None:
+            try:
+                import google.generativeai as genai
+            except Exception:
+                genai = False
+            _GENAI = genai
+    return _GENAI or None
 
+# genai.configure is process-global: only reconfigure when the key changes, and keep
+# one model handle per (key, model) so repeat calls skip client setup
+_MODELS: Dict[Tuple[str, str], Any] = {}
+_MODELS_LOCK = threading.Lock()
+_configured_key: Optional[str] = None
+
+def model_handle(key: str, model_name: str):
+    global _configured_key
+    with _MODELS_LOCK:
+        model = _MODELS.get((key, model_name))
+        if model is None:
+            genai = load_genai()
+            if key != _configured_key:
+                genai.configure(api_key=key); _configured_key = key
+            model = _MODELS[(key, model_name)] = genai.GenerativeModel(model_name)
+        return model
+
+class AdviceCache:
+    # process-wide counters. A hit is a pure read: its per-entry count waits in memory and is
+    # written with the next put, which goes through the file's writer, so serving cached
+    # advice never moves the data version the read caches are keyed on.
+    hits = misses = 0
+    saved_ms = 0.0
+    _pending: Dict[Tuple[str, str], List[float]] = {}  # (db path, key) -> [hits, last_hit_at, latency_ms]
+    _lock = threading.Lock()
+
+    def __init__(self, db: FinanceDb, ttl: float = AI_CACHE_TTL_SECS, max_entries: int = AI_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        key, now = self.key(model_name, prompt), time.time()
+        with self.db.connect() as conn:
+            row = conn.execute("SELECT advice, latency_ms FROM ai_advice_cache WHERE key=? AND created_at >= ?;",
+                               (key, now - self.ttl)).fetchone()
+        with AdviceCache._lock:
+            if row is None:
+                AdviceCache.misses += 1
+                return None
+            AdviceCache.hits += 1
+            AdviceCache.saved_ms += row[1]
+            pending = AdviceCache._pending.setdefault((self.db.path, key), [0, now, row[1]])
+            pending[0] += 1; pending[1] = now
+        return row[0]
+
+    def _take_pending(self) -> List[Tuple[int, float, str]]:
+        out = []
+        with AdviceCache._lock:
+            for path, key in [k for k in AdviceCache._pending if k[0] == self.db.path]:
+                n, last, _ = AdviceCache._pending.pop((path, key))
+                out.append((int(n), last, key))
+        return out
+
+    def put(self, model_name: str, prompt: str, advice: str, latency_ms: float):
+        now, key = time.time(), self.key(model_name, prompt)
+        hits = self._take_pending()
+        def write(conn):
+            conn.executemany("UPDATE ai_advice_cache SET hits = hits + ?, last_hit_at = MAX(last_hit_at, ?) WHERE key=?;",
+                             hits)
+            conn.execute("""
+                INSERT INTO ai_advice_cache (key, model, advice, latency_ms, created_at, last_hit_at, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(key) DO UPDATE SET advice=excluded.advice, latency_ms=excluded.latency_ms,
+                    created_at=excluded.created_at, last_hit_at=excluded.last_hit_at, hits=0;
+            """, (key, model_name, advice, latency_ms, now, now))
+            # drop expired entries, then the least recently used beyond the size bound
+            conn.execute("DELETE FROM ai_advice_cache WHERE created_at < ?;", (now - self.ttl,))
+            conn.execute("""
+                DELETE FROM ai_advice_cache WHERE key IN (
+                    SELECT key FROM ai_advice_cache ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?);
+            """, (self.max_entries,))
+        writer_for(self.db).call(write)
+
+    def stats(self) -> Dict[str, float]:
+        with self.db.connect() as conn:
+            entries, hits, saved_ms = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * latency_ms), 0) FROM ai_advice_cache;
+            """).fetchone()
+        with AdviceCache._lock:
+            pending = [v for k, v in AdviceCache._pending.items() if k[0] == self.db.path]
+        lookups = AdviceCache.hits + AdviceCache.misses
+        return {"entries": entries, "lifetime_hits": hits + sum(n for n, _, _ in pending),
+                "lifetime_saved_ms": saved_ms + sum(n * ms for n, _, ms in pending),
+                "hits": AdviceCache.hits, "misses": AdviceCache.misses, "saved_ms": AdviceCache.saved_ms,
+                "hit_rate": AdviceCache.hits / lookups if lookups else 0.0}
+
+# ---------- Backends ----------
+class AdviceBackend(ABC):
+    name = "base"
+
+    def available(self) -> Tuple[bool, str]:
+        return True, ""
+
+    def cache_name(self, model_name: str) -> str:
+        return f"{self.name}:{model_name}"
+
+    @abstractmethod
+    def stream(self, prompt: str, model_name: str, timeout: float) -> Iterator[str]:
+        ...
+
+class GeminiBackend(AdviceBackend):
+    name = "gemini"
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def available(self) -> Tuple[bool, str]:
+        if not load_genai():
+            return False, "google generativeai not installed."
+        if not self.key:
+            return False, "GEMINI_API_KEY not set."
+        return True, ""
+
+    def cache_name(self, model_name: str) -> str:
+        return model_name
+
+    def stream(self, prompt: str, model_name: str, timeout: float) -> Iterator[str]:
+        resp = model_handle(self.key, model_name).generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        for chunk in resp:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+class LocalBackend(AdviceBackend):
+    # deterministic stand-in for tests and load benchmarks: same prompt, same words, no network
+    name = "local"
+
+    def __init__(self, delay_ms: float = AI_LOCAL_DELAY_MS):
+        self.delay_ms = delay_ms
+
+    def stream(self, prompt: str, model_name: str, timeout: float) -> Iterator[str]:
+        expenses = re.findall(r"^- (.+): ([\d.]+)$", prompt.split("Expenses by category:")[-1].split("Constraints:")[0], re.M)
+        net = re.search(r"- Net: (-?[\d.]+)", prompt)
+        tips = [f"- Trim **{name}** by 10% (about {float(amt) * 0.1:,.2f} per period)." for name, amt in expenses[:3]]
+        if net and float(net.group(1)) < 0:
+            tips.append("- Spending exceeds income: pause non-essential purchases until net is positive.")
+        tips = tips or ["- Start with the 50/30/20 rule and build a small emergency fund."]
+        for word in re.findall(r"\S+\s*", "\n".join(tips)):
+            if self.delay_ms:
+                time.sleep(self.delay_ms / 1000)
+            yield word
+
+def make_backend(name: str, key: str) -> AdviceBackend:
+    return LocalBackend() if name == "local" else GeminiBackend(key)
+
+# Generation runs on a bounded pool; the caller only drains a queue, so a slow or hung
+# model call can be abandoned at the deadline without tying up the script thread.
+_EXECUTOR = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY, thread_name_prefix="ai-advice")
+_PENDING = threading.BoundedSemaphore(AI_MAX_PENDING)
+_DONE = object()
+
+@instrumented("ai")
 class AiService:
-    def __init__(self):
-        pass
+    def __init__(self, db: Optional[FinanceDb] = None, backend: Optional[AdviceBackend] = None):
+        self.cache = AdviceCache(db) if db is not None else None
+        self.backend = backend
 
     def api_key(self) -> str:
         return st.session_state.get("gemini_key","") or ENV_GEMINI_API_KEY
 
-    def init(self):
-        if not genai:
-            return False, "google generativeai not installed."
-        key = self.api_key()
-        if not key:
-            return False, "GEMINI_API_KEY not set."
-        try:
-            genai.configure(api_key=key)
-            return True, ""
-        except Exception as e:
-            return False, f"{e}"
+    def get_backend(self) -> AdviceBackend:
+        return self.backend or make_backend(AI_BACKEND, self.api_key())
 
-    def make_prompt(self, df: pd.DataFrame, months: int, finance: FinanceService) -> str:
-        if df.empty:
+    def make_prompt(self, finance: FinanceService, months: int, start: Optional[str] = None, end: Optional[str] = None,
+                    typ: Optional[str] = None, category_ids: Optional[List[int]] = None) -> str:
+        cutoff = (pd.Timestamp.today().date().replace(day=1) - pd.offsets.MonthBegin(months)).date().isoformat()
+        recent_start = max(start, cutoff) if start and is_date_valid(start) else cutoff
+        by_cat = finance.repo.by_category(recent_start, end, typ, category_ids)
+        if by_cat.empty:
+            by_cat = finance.repo.by_category(start, end, typ, category_ids)
+        if by_cat.empty:
             return "User has no data."
-        cutoff = (pd.Timestamp.today().date().replace(day=1) - pd.offsets.MonthBegin(months)).date()
-        recent = df[df["date"] >= cutoff].copy()
-        if recent.empty:
-            recent = df.copy()
 
-        income = recent[recent["type"]=="INCOME"].groupby("category")["amount"].sum().sort_values(ascending=False).to_dict()
-        expense = recent[recent["type"]=="EXPENSE"].groupby("category")["amount"].sum().sort_values(ascending=False).to_dict()
+        def totals(kind):
+            sub = by_cat[by_cat["type"]==kind]
+            return dict(zip(sub["category"], sub["amount"].astype(float)))
+        income = totals("INCOME"); expense = totals("EXPENSE")
         total_income = sum(income.values()); total_expense = sum(expense.values()); net = total_income-total_expense
 
         def lines(d): return "\n".join([f"- {k}: {v:.2f}" for k,v in d.items()])
@@ -71,13 +244,59 @@ Constraints:
 - If data is sparse, give starter advice (50/30/20 rule, emergency fund, etc.)
 """.strip()
 
-    def get_advice(self, prompt: str, model_name: str = "gemini-1.5-pro") -> str:
-        ok, msg = self.init()
+    def stream_advice(self, prompt: str, model_name: str = "gemini-1.5-pro",
+                      timeout: float = AI_TIMEOUT_SECS) -> Iterator[str]:
+        backend = self.get_backend()
+        cache_name = backend.cache_name(model_name)
+        if self.cache is not None:
+            cached = self.cache.get(cache_name, prompt)
+            if cached is not None:
+                yield cached; return
+        ok, msg = backend.available()
         if not ok:
-            return f" AI advice unavailable: {msg}"
+            yield f" AI advice unavailable: {msg}"; return
+        if not _PENDING.acquire(blocking=False):
+            yield "AI advice is busy right now, please try again in a moment."; return
+
+        out: queue.Queue = queue.Queue()
+        cancel = threading.Event()
+
+        def work():
+            try:
+                t0 = time.perf_counter()
+                parts = []
+                for piece in backend.stream(prompt, model_name, timeout):
+                    if cancel.is_set():
+                        return
+                    parts.append(piece); out.put(piece)
+                advice = "".join(parts).strip()
+                if not advice:
+                    out.put("No advice returned")
+                elif self.cache is not None:
+                    self.cache.put(cache_name, prompt, advice, (time.perf_counter() - t0) * 1000)
+            except Exception as e:
+                out.put(f"AI advice error: {e}")
+            finally:
+                out.put(_DONE)
+                _PENDING.release()
+
+        _EXECUTOR.submit(work)
+        deadline = time.monotonic() + timeout
         try:
-            model = genai.GenerativeModel(model_name)
-            resp = model.generate_content(prompt)
-            return (getattr(resp,"text","") or "").strip() or "No advice returned"
-        except Exception as e:
-            return f"AI advice error: {e}"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield f"\n\nAI advice timed out after {timeout:g}s."; return
+                try:
+                    item = out.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            # also runs when Streamlit stops the script mid-stream (rerun / navigation)
+            cancel.set()
+
+    def get_advice(self, prompt: str, model_name: str = "gemini-1.5-pro", timeout: float = AI_TIMEOUT_SECS) -> str:
+        return "".join(self.stream_advice(prompt, model_name, timeout))
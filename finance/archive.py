@@ -0,0 +1,179 @@
+import datetime as dt
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from .config import ARCHIVE_COMPRESSION, ARCHIVE_ROW_GROUP
+from .db import FinanceDb
+from .search import term_patterns
+from .writer import writer_for
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+
+RAW_COLUMNS = ["id", "date", "description", "amount_cents", "category_id", "type"]
+ROLLUP_COLUMNS = ["month", "category_id", "type", "total_cents", "n"]
+
+def _schema():
+    return pa.schema([("id", pa.int64()), ("date", pa.date32()), ("description", pa.string()),
+                      ("amount_cents", pa.int64()), ("category_id", pa.int32()), ("type", pa.string())])
+
+def _date(s: Optional[str]) -> Optional[dt.date]:
+    # filter bound -> date; invalid bounds are ignored, as in FinanceRep._dates
+    try:
+        return dt.date.fromisoformat(s) if s else None
+    except (TypeError, ValueError):
+        return None
+
+def _overlaps(year: int, start: Optional[str], end: Optional[str]) -> bool:
+    lo, hi = _date(start), _date(end)
+    return (lo is None or lo <= dt.date(year, 12, 31)) and (hi is None or hi >= dt.date(year, 1, 1))
+
+class Archive:
+    # Closed years live in <db>.archive/transactions_<year>.<stamp>.parquet, sorted newest first
+    # so row-group date statistics prune scans. Their monthly rollup rows stay in SQLite (and
+    # a copy is written beside them), so whole-month aggregates never touch the files; only
+    # raw-row reads and partial-month edges do. The archive_years table is the manifest.
+    def __init__(self, db: FinanceDb):
+        self.db = db
+        self.root = db.path + ".archive"
+
+    def manifest(self) -> pd.DataFrame:
+        with self.db.connect() as conn:
+            return pd.read_sql_query("SELECT year, path, rollup_path, rows, total_cents, archived_at "
+                                     "FROM archive_years ORDER BY year;", conn)
+
+    def paths(self, start: Optional[str], end: Optional[str]) -> List[str]:
+        with self.db.connect() as conn:
+            rows = conn.execute("SELECT year, path FROM archive_years ORDER BY year DESC;").fetchall()
+        paths = [os.path.join(self.root, p) for y, p in rows if _overlaps(y, start, end)]
+        if paths and pa is None:
+            raise RuntimeError("pyarrow is required to read archived years.")
+        return paths
+
+    def read(self, start: Optional[str], end: Optional[str], typ: Optional[str],
+             category_ids: Optional[List[int]], after: Optional[Tuple[str, int]] = None,
+             limit: Optional[int] = None, search: Optional[str] = None) -> pd.DataFrame:
+        # archived rows matching the same predicates as FinanceRep._trans_query, date as ISO text;
+        # a search is applied as regexes with the FTS tokenizer's word boundaries
+        paths = self.paths(start, end)
+        if not paths:
+            return pd.DataFrame(columns=RAW_COLUMNS)
+        f = self._filter(start, end, typ, category_ids, after, search)
+        table = ds.dataset(paths, format="parquet", schema=_schema()).to_table(filter=f)
+        if limit:
+            table = table.sort_by([("date", "descending"), ("id", "descending")]).slice(0, int(limit))
+        table = table.set_column(1, "date", pc.cast(table["date"], pa.string()))
+        return table.to_pandas()
+
+    def _filter(self, start: Optional[str], end: Optional[str], typ: Optional[str],
+                category_ids: Optional[List[int]], after: Optional[Tuple[str, int]], search: Optional[str]):
+        f = ds.scalar(True)
+        lo, hi = _date(start), _date(end)
+        if lo:
+            f &= ds.field("date") >= pa.scalar(lo)
+        if hi:
+            f &= ds.field("date") <= pa.scalar(hi)
+        if typ in ("INCOME", "EXPENSE"):
+            f &= ds.field("type") == typ
+        if category_ids:
+            f &= ds.field("category_id").isin([int(c) for c in category_ids])
+        if after:
+            d = pa.scalar(dt.date.fromisoformat(str(after[0])))
+            f &= (ds.field("date") < d) | ((ds.field("date") == d) & (ds.field("id") < int(after[1])))
+        for pattern in term_patterns(search):
+            f &= pc.match_substring_regex(ds.field("description"), pattern=pattern)
+        return f
+
+    def batches(self, start: Optional[str], end: Optional[str], typ: Optional[str],
+                category_ids: Optional[List[int]], search: Optional[str] = None,
+                batch_rows: int = ARCHIVE_ROW_GROUP) -> Iterator[pd.DataFrame]:
+        # same rows as read(), a record batch at a time (file order: newest year first, date DESC)
+        paths = self.paths(start, end)
+        if not paths:
+            return
+        f = self._filter(start, end, typ, category_ids, None, search)
+        scanner = ds.dataset(paths, format="parquet", schema=_schema()).scanner(filter=f, batch_size=batch_rows)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.set_column(1, "date", pc.cast(batch["date"], pa.string())).to_pandas()
+
+    def rollups(self) -> pd.DataFrame:
+        paths = [os.path.join(self.root, p) for p in self.manifest()["rollup_path"]]
+        if not paths:
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+        return pd.concat([pq.read_table(p, memory_map=True).to_pandas() for p in paths], ignore_index=True)
+
+    def archive_year(self, year: int) -> Dict:
+        if pa is None:
+            raise RuntimeError("pyarrow is required to archive (pip install pyarrow).")
+        if year >= dt.date.today().year:
+            raise ValueError(f"{year} is not a closed year.")
+        lo, hi = f"{year}-01-01", f"{year}-12-31"
+        t0 = time.perf_counter()
+        with self.db.connect() as conn:
+            hot = pd.read_sql_query("SELECT id, date, description, amount_cents, category_id, type FROM transactions "
+                                    "WHERE date >= ? AND date <= ?;", conn, params=(lo, hi))
+            prev = conn.execute("SELECT path, rollup_path FROM archive_years WHERE year=?;", (year,)).fetchone()
+        if hot.empty:
+            return {"year": year, "moved": 0, "rows": None, "seconds": time.perf_counter() - t0}
+        hot["date"] = pd.to_datetime(hot["date"]).dt.date
+        table = pa.Table.from_pandas(hot, schema=_schema(), preserve_index=False)
+        if prev:
+            # re-archiving a year that gained late rows: fold in what is already archived
+            table = pa.concat_tables([pq.read_table(os.path.join(self.root, prev[0]), schema=_schema()), table])
+        table = table.sort_by([("date", "descending"), ("id", "descending")])
+
+        os.makedirs(self.root, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        name, rollup_name = f"transactions_{year}.{stamp}.parquet", f"rollup_{year}.{stamp}.parquet"
+        pq.write_table(table, os.path.join(self.root, name), compression=ARCHIVE_COMPRESSION,
+                       row_group_size=ARCHIVE_ROW_GROUP)
+        written = pq.read_table(os.path.join(self.root, name), columns=["amount_cents"], memory_map=True)
+        rows, cents = written.num_rows, pc.sum(written["amount_cents"]).as_py() or 0
+        if (rows, cents) != (table.num_rows, pc.sum(table["amount_cents"]).as_py() or 0):
+            os.remove(os.path.join(self.root, name))
+            raise RuntimeError(f"Verification of {name} failed.")
+        hot_ids, hot_cents = len(hot), int(hot["amount_cents"].sum())
+
+        def move(conn):
+            # the files are only referenced once this commits; re-check nothing changed since the read
+            n, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(amount_cents), 0) FROM transactions "
+                                    "WHERE date >= ? AND date <= ?;", (lo, hi)).fetchone()
+            if (n, total) != (hot_ids, hot_cents):
+                raise RuntimeError(f"{year} changed while archiving; try again.")
+            rollup = conn.execute("SELECT month, category_id, type, total_cents, n FROM monthly_category_totals "
+                                  "WHERE month >= ? AND month <= ?;", (f"{year}-01", f"{year}-12")).fetchall()
+            conn.execute("DELETE FROM transactions WHERE date >= ? AND date <= ?;", (lo, hi))
+            # the delete trigger emptied these months; the rollup keeps describing the archived rows
+            conn.executemany("INSERT OR REPLACE INTO monthly_category_totals (month, category_id, type, total_cents, n) "
+                             "VALUES (?, ?, ?, ?, ?);", rollup)
+            conn.execute("INSERT OR REPLACE INTO archive_years (year, path, rollup_path, rows, total_cents, archived_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?);", (year, name, rollup_name, rows, cents, time.time()))
+
+        try:
+            rollup = pd.DataFrame(self._rollup_rows(year), columns=ROLLUP_COLUMNS)
+            pq.write_table(pa.Table.from_pandas(rollup, preserve_index=False), os.path.join(self.root, rollup_name),
+                           compression=ARCHIVE_COMPRESSION)
+            writer_for(self.db).call(move)
+        except Exception:
+            for p in (name, rollup_name):
+                if os.path.exists(os.path.join(self.root, p)):
+                    os.remove(os.path.join(self.root, p))
+            raise
+        if prev:
+            for p in prev:
+                os.remove(os.path.join(self.root, p))
+        return {"year": year, "moved": hot_ids, "rows": rows, "file": name,
+                "mb": os.path.getsize(os.path.join(self.root, name)) / 1e6, "seconds": time.perf_counter() - t0}
+
+    def _rollup_rows(self, year: int) -> List[Tuple]:
+        with self.db.connect() as conn:
+            return conn.execute("SELECT month, category_id, type, total_cents, n FROM monthly_category_totals "
+                                "WHERE month >= ? AND month <= ? ORDER BY month, category_id, type;",
+                                (f"{year}-01", f"{year}-12")).fetchall()
@@ -0,0 +1,281 @@
+import datetime as dt
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from .config import (BACKUP_DIR, BACKUP_PAGES, BACKUP_SLEEP_MS, BACKUP_KEEP, BACKUP_MAX_RESTARTS,
+                     BACKUP_INTERVAL_SECS, DB_BUSY_TIMEOUT)
+from .db import FinanceDb
+from .metrics import register_source
+
+log = logging.getLogger("finance.backup")
+
+@dataclass
+class SnapshotReport:
+    path: str
+    pages: int = 0
+    mb: float = 0.0
+    seconds: float = 0.0
+    steps: int = 0
+    restarts: int = 0
+    max_step_ms: float = 0.0
+    integrity: str = ""
+    archive_files: int = 0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    pruned: List[str] = field(default_factory=list)
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.mb / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        out = (f"Snapshot {self.path}: {self.mb:,.1f} MB ({self.pages:,} pages) in {self.seconds:.2f}s "
+               f"({self.mb_per_sec:,.1f} MB/s, {self.steps:,} steps, longest {self.max_step_ms:.1f} ms, "
+               f"{self.restarts} restart(s)); integrity {self.integrity}")
+        if self.latency_ms:
+            l = self.latency_ms
+            out += (f"; probe latency p50/p95 {l['baseline_p50']:.2f}/{l['baseline_p95']:.2f} ms before, "
+                    f"{l['during_p50']:.2f}/{l['during_p95']:.2f} ms during ({l['probes']} probes)")
+        return out + (f"; pruned {len(self.pruned)} old snapshot(s)." if self.pruned else ".")
+
+class _Restarted(Exception):
+    pass
+
+def verify(path: str, quick: bool = False) -> str:
+    # "ok" or the problems PRAGMA integrity_check reports, one per line
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(f"PRAGMA {'quick_check' if quick else 'integrity_check'};").fetchall()
+    finally:
+        conn.close()
+    return "\n".join(r[0] for r in rows)
+
+def _copy(src_path: str, dst_path: str, pages: int = -1, sleep_ms: float = 0,
+          report: Optional[SnapshotReport] = None) -> SnapshotReport:
+    # SQLite online backup, `pages` at a time with a pause between steps; the source is only
+    # locked during a step. A write from another connection makes SQLite start over, so after
+    # BACKUP_MAX_RESTARTS restarts it copies in one step: a single read transaction, which
+    # under WAL still doesn't block writers.
+    report = report or SnapshotReport(dst_path)
+    state = {"remaining": None, "at": time.perf_counter()}
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        report.steps += 1
+        report.pages = total
+        report.max_step_ms = max(report.max_step_ms, (now - state["at"]) * 1000 - (sleep_ms if report.steps > 1 else 0))
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            report.restarts += 1
+            if report.restarts > BACKUP_MAX_RESTARTS:
+                raise _Restarted()
+        state["remaining"], state["at"] = remaining, now
+    src = sqlite3.connect(src_path, timeout=DB_BUSY_TIMEOUT)  # its own connection: it is held for the whole copy
+    dst = sqlite3.connect(dst_path)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=sleep_ms / 1000)
+        except _Restarted:
+            log.warning("backup of %s kept restarting under writes; copying in one step", src_path)
+            src.backup(dst, pages=-1, progress=progress)
+        # a self-contained file: no -wal next to the copy
+        dst.execute("PRAGMA journal_mode = DELETE;").fetchall()
+        report.pages = report.pages or dst.execute("PRAGMA page_count;").fetchone()[0]
+    finally:
+        dst.close(); src.close()
+    return report
+
+def _copy_archive(src_db: str, dst_db: str) -> int:
+    # archived years are immutable Parquet files named in archive_years: hard-link them when
+    # the snapshot is on the same filesystem, copy them otherwise
+    conn = sqlite3.connect(f"file:{dst_db}?mode=ro", uri=True)
+    try:
+        names = [n for row in conn.execute("SELECT path, rollup_path FROM archive_years;") for n in row]
+    except sqlite3.OperationalError:
+        names = []  # schema from before the archive
+    finally:
+        conn.close()
+    if names:
+        os.makedirs(dst_db + ".archive", exist_ok=True)
+    for name in names:
+        src, dst = os.path.join(src_db + ".archive", name), os.path.join(dst_db + ".archive", name)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    return len(names)
+
+class _LatencyProbe:
+    # a small indexed read through the app's connection pool, timed before and during a
+    # backup, as a stand-in for request latency
+    SQL = "SELECT COUNT(*), SUM(amount_cents) FROM transactions WHERE date >= ?;"
+
+    def __init__(self, db: FinanceDb, every_ms: float = 20):
+        self.db, self.every = db, every_ms / 1000
+        self.since = (dt.date.today() - dt.timedelta(days=30)).isoformat()
+        self.baseline: List[float] = []
+        self.during: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="backup-probe", daemon=True)
+
+    def _once(self) -> float:
+        t0 = time.perf_counter()
+        with self.db.connect() as conn:
+            conn.execute(self.SQL, (self.since,)).fetchall()
+        return (time.perf_counter() - t0) * 1000
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.during.append(self._once())
+            self._stop.wait(self.every)
+
+    def start(self, baseline: int = 25):
+        for _ in range(baseline):
+            self.baseline.append(self._once()); time.sleep(self.every)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, float]:
+        self._stop.set(); self._thread.join()
+        during = self.during or [0.0]
+        pct = lambda xs: (statistics.median(xs), sorted(xs)[min(len(xs) - 1, int(len(xs) * 0.95))])
+        (b50, b95), (d50, d95) = pct(self.baseline), pct(during)
+        return {"baseline_p50": b50, "baseline_p95": b95, "during_p50": d50, "during_p95": d95,
+                "probes": len(self.during)}
+
+class Backups:
+    # Snapshots of one database in <db>.backups/ (or BACKUP_DIR), named <stem>-<UTC stamp>.db,
+    # each with its archived years in <snapshot>.archive/. Only verified snapshots get their
+    # final name; the newest `keep` are kept.
+    def __init__(self, db: FinanceDb, root: Optional[str] = None, pages: int = BACKUP_PAGES,
+                 sleep_ms: float = BACKUP_SLEEP_MS, keep: int = BACKUP_KEEP):
+        self.db = db
+        self.root = root or BACKUP_DIR or db.path + ".backups"
+        self.pages, self.sleep_ms, self.keep = pages, sleep_ms, keep
+        self.stem = os.path.splitext(os.path.basename(db.path))[0]
+        self._name_re = re.compile(rf"^{re.escape(self.stem)}-(\d{{8}})-(\d{{6}})(?:-(\d+))?\.db$")
+        self.last: Optional[SnapshotReport] = None
+        self.failures = 0
+
+    def snapshots(self) -> List[str]:
+        # oldest first; only names _new_path makes, so "<stem>-old.db" or another database's
+        # "<stem>-x-<stamp>.db" sharing the directory is never listed (or pruned)
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            m = self._name_re.match(name)
+            if m:
+                found.append((m.group(1), m.group(2), int(m.group(3) or 0), name))
+        return [os.path.join(self.root, f[-1]) for f in sorted(found)]
+
+    def _new_path(self) -> str:
+        stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        path, n = os.path.join(self.root, f"{self.stem}-{stamp}.db"), 1
+        while os.path.exists(path):
+            path = os.path.join(self.root, f"{self.stem}-{stamp}-{n}.db"); n += 1
+        return path
+
+    def snapshot(self, probe: bool = False, quick: bool = False) -> SnapshotReport:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._new_path()
+        tmp = path + ".tmp"
+        report = SnapshotReport(path)
+        prober = _LatencyProbe(self.db) if probe else None
+        if prober:
+            prober.start()
+        t0 = time.perf_counter()
+        try:
+            _copy(self.db.path, tmp, self.pages, self.sleep_ms, report)
+        except Exception:
+            self.failures += 1
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            report.seconds = time.perf_counter() - t0
+            if prober:
+                report.latency_ms = prober.stop()
+        report.integrity = verify(tmp, quick)
+        if report.integrity != "ok":
+            self.failures += 1
+            os.remove(tmp)
+            raise RuntimeError(f"Snapshot of {self.db.path} failed its integrity check: {report.integrity}")
+        os.replace(tmp, path)
+        report.mb = os.path.getsize(path) / 2**20
+        report.archive_files = _copy_archive(self.db.path, path)
+        report.pruned = self.prune()
+        self.last = report
+        return report
+
+    def prune(self, keep: Optional[int] = None) -> List[str]:
+        keep = self.keep if keep is None else keep
+        old = self.snapshots()[:-keep] if keep > 0 else []
+        for path in old:
+            os.remove(path)
+            shutil.rmtree(path + ".archive", ignore_errors=True)
+        return old
+
+    def resolve(self, snapshot: str) -> str:
+        # a path, a file name in the backup directory, or "latest"
+        if snapshot == "latest":
+            snaps = self.snapshots()
+            if not snaps:
+                raise FileNotFoundError(f"No snapshots in {self.root}")
+            return snaps[-1]
+        if os.path.exists(snapshot):
+            return snapshot
+        path = os.path.join(self.root, snapshot)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such snapshot: {snapshot}")
+        return path
+
+    def restore(self, snapshot: str, target: str) -> str:
+        # into a new file (never over a live database); point FINANCE_DB at it to switch over
+        src = self.resolve(snapshot)
+        if os.path.exists(target):
+            raise FileExistsError(f"{target} already exists; restore into a new path.")
+        status = verify(src)
+        if status != "ok":
+            raise RuntimeError(f"Snapshot {src} failed its integrity check: {status}")
+        tmp = target + ".tmp"
+        try:
+            _copy(src, tmp)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        _copy_archive(src, target)
+        return target
+
+    def stats(self) -> Dict[str, float]:
+        last = self.last
+        return {"snapshots": len(self.snapshots()), "failures": self.failures,
+                "last_mb": last.mb if last else 0.0, "last_seconds": last.seconds if last else 0.0,
+                "last_mb_per_sec": last.mb_per_sec if last else 0.0, "last_max_step_ms": last.max_step_ms if last else 0.0}
+
+    def run_every(self, seconds: float, stop: Optional[threading.Event] = None, probe: bool = False):
+        # blocking loop: a snapshot every `seconds`, failures logged and retried next round
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                log.info(self.snapshot(probe=probe).summary())
+            except Exception:
+                log.exception("snapshot of %s failed", self.db.path)
+            stop.wait(seconds)
+
+def schedule_backups(db: FinanceDb, seconds: float = BACKUP_INTERVAL_SECS) -> Optional[Backups]:
+    # in-process schedule (BACKUP_INTERVAL_SECS > 0); call once per database file, e.g. via db.once
+    if seconds <= 0:
+        return None
+    backups = Backups(db)
+    stop = threading.Event()
+    def loop():
+        stop.wait(seconds)  # the first snapshot waits one interval, not app start
+        backups.run_every(seconds, stop)
+    threading.Thread(target=loop, name="db-backup", daemon=True).start()
+    register_source(f"backup:{db.path}", backups.stats)
+    return backups
@@ -0,0 +1,69 @@
+import datetime as dt
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+def month_starts(first: dt.date, last: dt.date) -> List[dt.date]:
+    n = (last.year - first.year) * 12 + last.month - first.month + 1
+    return [dt.date(first.year + (first.month - 1 + i) // 12, (first.month - 1 + i) % 12 + 1, 1) for i in range(max(n, 0))]
+
+class BudgetMatrix:
+    # Expense actuals of every budgeted category for every month of a range, as one dense
+    # (months × categories) array filled from a single grouped query. Each month is clipped
+    # to the range, so edge months hold partial spend. Every budget view slices this.
+    def __init__(self, months: List[dt.date], limits: pd.DataFrame, spend: pd.DataFrame,
+                 start: Optional[dt.date] = None, end: Optional[dt.date] = None):
+        self.months = months
+        self.start, self.end = start, end
+        self.category_ids = limits["category_id"].to_numpy("int64")
+        self.categories = limits["category"].to_numpy(object)
+        self.limits = limits["monthly_limit"].to_numpy("float64")
+        self.actual = np.zeros((len(months), len(self.category_ids)))
+        if len(spend) and len(months):
+            keys = np.array([m.strftime("%Y-%m") for m in months])
+            order = np.argsort(self.category_ids)
+            rows = np.searchsorted(keys, spend["month"].to_numpy(str))
+            cols = order[np.searchsorted(self.category_ids, spend["category_id"].to_numpy("int64"), sorter=order)]
+            np.add.at(self.actual, (rows, cols), spend["cents"].to_numpy("int64") / 100.0)
+
+    def _row(self, day: dt.date) -> Optional[int]:
+        first = day.replace(day=1)
+        return self.months.index(first) if first in self.months else None
+
+    def ratio(self) -> np.ndarray:
+        # actual / limit; NaN where the limit is 0
+        return np.divide(self.actual, self.limits, out=np.full_like(self.actual, np.nan), where=self.limits > 0)
+
+    def month(self, day: dt.date) -> pd.DataFrame:
+        # same columns as FinanceRep.budget_vs_actual: category_id, category, monthly_limit, actual
+        i = self._row(day)
+        actual = self.actual[i] if i is not None else np.zeros(len(self.limits))
+        return pd.DataFrame({"category_id": self.category_ids, "category": self.categories,
+                             "monthly_limit": self.limits, "actual": actual})
+
+    def adherence(self) -> pd.DataFrame:
+        # months × categories of actual/limit, for the heatmap
+        return pd.DataFrame(self.ratio(), index=pd.to_datetime(self.months), columns=self.categories)
+
+    def within_share(self) -> float:
+        # share of budgeted category-months that stayed at or under the limit
+        return float((self.actual <= self.limits).mean()) if self.actual.size else 1.0
+
+    def projection(self, today: dt.date) -> pd.DataFrame:
+        # extrapolate this month's spend at its daily rate so far to the end of the month (or of
+        # the range, if it ends sooner); lists categories on pace to exceed a limit not yet hit
+        i = self._row(today)
+        cols = ["category_id", "category", "monthly_limit", "actual", "projected"]
+        if i is None:
+            return pd.DataFrame(columns=cols)
+        first = today.replace(day=1)
+        last = (first + dt.timedelta(days=32)).replace(day=1) - dt.timedelta(days=1)
+        lo = max(first, self.start) if self.start else first
+        hi = min(last, self.end) if self.end else last
+        if not lo <= today < hi:
+            return pd.DataFrame(columns=cols)
+        projected = self.actual[i] * ((hi - lo).days + 1) / ((today - lo).days + 1)
+        hit = (projected > self.limits) & (self.actual[i] <= self.limits)
+        out = pd.DataFrame({"category_id": self.category_ids[hit], "category": self.categories[hit],
+                            "monthly_limit": self.limits[hit], "actual": self.actual[i][hit], "projected": projected[hit]})
+        return out.sort_values("projected", ascending=False, ignore_index=True)
@@ -0,0 +1,94 @@
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+import pandas as pd
+from .config import READ_CACHE_SIZE
+from .db import FinanceDb, ConnectionPool, on_release
+
+_MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+class ReadCache:
+    # keys are tagged with the pool's data version, so any write makes older entries unreachable
+    def __init__(self, pool: ConnectionPool, maxsize: int = READ_CACHE_SIZE):
+        self.pool = pool
+        self.lru = LRUCache(maxsize)
+        self._version = None
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        version = self.pool.data_version()
+        if version != self._version:
+            self.lru.clear(); self._version = version
+        value = self.lru.get((version, key))
+        if value is _MISSING:
+            value = loader()
+            self.lru.put((version, key), value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.lru.stats(), "data_version": self.pool.version}
+
+_CACHES: Dict[str, ReadCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def read_cache_for(db: FinanceDb) -> ReadCache:
+    with _CACHES_LOCK:
+        cache = _CACHES.get(db.path)
+        if cache is None:
+            cache = _CACHES[db.path] = ReadCache(db.pool)
+        return cache
+
+def _release(path: str):
+    with _CACHES_LOCK:
+        _CACHES.pop(path, None)
+
+on_release(_release)
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def cached(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        key = (fn.__name__, _freeze(args), _freeze(kwargs))
+        value = self.cache.get_or_load(key, lambda: fn(self, *args, **kwargs))
+        # shallow copy so callers adding/renaming columns don't alter the shared entry
+        return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+    return wrapper
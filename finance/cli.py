@@ -0,0 +1,310 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List, Optional
+import pandas as pd
+from .config import (DB_PATH, EXPORT_CHUNK_ROWS, IMPORT_CHUNK_SIZE, TENANT_DIR, BACKUP_KEEP, BACKUP_PAGES,
+                     BACKUP_SLEEP_MS, BACKUP_INTERVAL_SECS)
+from .db import FinanceDb, list_tenants
+from .repository import FinanceRep
+from .importer import Importer
+from .export import FORMATS, export_bytes, write_export
+from .reports import ReportWriter, expand_jobs, load_jobs, parse_range, run_jobs
+from .backup import Backups, verify
+
+def cmd_migrate(args) -> int:
+    version = FinanceDb(args.db).init_db()
+    print(f"{args.db}: schema version {version}")
+    return 0
+
+def cmd_check_plans(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    bad = FinanceRep(db).scan_violations()
+    for name, detail in bad:
+        print(f"{name}: {detail}")
+    print(f"{len(bad)} query plan(s) fall back to a table scan." if bad else "All known queries use an index.")
+    return 1 if bad else 0
+
+def cmd_rollup(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    repo = FinanceRep(db)
+    if args.rebuild:
+        print(f"Rebuilt monthly_category_totals: {repo.rebuild_rollup()} row(s).")
+    bad = repo.verify_rollup()
+    if not bad.empty:
+        print(bad.to_string(index=False))
+    print(f"{len(bad)} rollup row(s) out of sync." if len(bad) else "Rollup matches transactions.")
+    return 1 if len(bad) else 0
+
+def cmd_search_index(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    repo = FinanceRep(db)
+    if args.rebuild:
+        repo.rebuild_search()
+        print("Rebuilt transactions_fts.")
+    err = repo.check_search()
+    print(f"Search index out of sync: {err}" if err else "Search index matches transactions.")
+    return 1 if err else 0
+
+def cmd_dedupe(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    repo = FinanceRep(db)
+    filled = repo.backfill_fingerprints()
+    if filled:
+        print(f"Fingerprinted {filled:,} row(s) written without one.")
+    dups = repo.find_duplicates()
+    if dups.empty:
+        print("No duplicate transactions.")
+        return 0
+    if args.show:
+        print(dups.head(args.show).to_string(index=False))
+    groups = dups["keep_id"].nunique()
+    if not args.apply:
+        print(f"{len(dups):,} duplicate row(s) in {groups:,} group(s); run with --apply to delete them, keeping keep_id.")
+        return 1
+    print(f"Merged {groups:,} group(s): deleted {repo.merge_duplicates(dups):,} duplicate row(s).")
+    return 0
+
+def cmd_import(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    importer = Importer(FinanceRep(db))
+    failed = 0
+    for path in args.files:
+        report = importer.import_file(path, fmt=args.format, chunk_size=args.chunk_size, duplicates=args.duplicates)
+        print(f"{path}: {report.summary()}")
+        for line, reason in report.rejects[:args.show_rejects]:
+            print(f"  line {line}: {reason}")
+        if args.duplicates == "flag":
+            for line in report.duplicate_lines[:args.show_rejects]:
+                print(f"  line {line}: duplicate of an existing transaction")
+        failed += report.rejected
+    return 1 if failed and args.strict else 0
+
+def cmd_export(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    repo = FinanceRep(db)
+    fmt = args.format or next((f for f in FORMATS if args.out.endswith("." + FORMATS[f][1])), "csv")
+    parts = export_bytes(repo, fmt, args.start, args.end, args.type, args.categories, search=args.search,
+                         summary=not args.no_summary, chunk_rows=args.chunk_rows)
+    t0 = time.perf_counter()
+    if args.out == "-":
+        n = write_export(sys.stdout.buffer, parts)
+    else:
+        with open(args.out, "wb") as f:
+            n = write_export(f, parts)
+    elapsed = time.perf_counter() - t0
+    print(f"Exported {fmt} ({n / 1e6:,.1f} MB) in {elapsed:.2f}s.", file=sys.stderr)
+    return 0
+
+def cmd_archive(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    repo = FinanceRep(db)
+    if args.year or args.before:
+        with db.connect() as conn:
+            first = conn.execute("SELECT MIN(substr(date, 1, 4)) FROM transactions;").fetchone()[0]
+        years = args.year or (range(int(first), args.before) if first else [])
+        for year in years:
+            r = repo.archive.archive_year(year)
+            if r["moved"]:
+                print(f"{year}: moved {r['moved']:,} row(s) to {r['file']} ({r['mb']:.2f} MB, {r['rows']:,} archived) in {r['seconds']:.2f}s")
+            else:
+                print(f"{year}: nothing to archive")
+        if args.vacuum:
+            with db.connect() as conn:
+                conn.execute("VACUUM;")
+    m = repo.archive.manifest()
+    print(m.drop(columns=["archived_at"]).to_string(index=False) if not m.empty else "No archived years.")
+    return 0
+
+def cmd_backup(args) -> int:
+    db = FinanceDb(args.db)
+    db.init_db()
+    backups = Backups(db, args.dir, args.pages, args.sleep_ms, args.keep)
+    if args.action == "snapshot":
+        report = backups.snapshot(probe=args.probe, quick=args.quick)
+        print(json.dumps({**asdict(report), "mb_per_sec": report.mb_per_sec}) if args.json else report.summary())
+    elif args.action == "list":
+        snaps = backups.snapshots()
+        for path in snaps:
+            print(f"{path}  {os.path.getsize(path) / 2**20:,.1f} MB")
+        print(f"{len(snaps)} snapshot(s) in {backups.root}")
+    elif args.action == "verify":
+        path = backups.resolve(args.snapshot or "latest")
+        status = verify(path, args.quick)
+        print(f"{path}: {status}")
+        return 0 if status == "ok" else 1
+    elif args.action == "restore":
+        if not args.to:
+            print("restore needs --to NEW_PATH", file=sys.stderr)
+            return 2
+        print(f"Restored {backups.resolve(args.snapshot or 'latest')} to {backups.restore(args.snapshot or 'latest', args.to)}")
+    else:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        try:
+            backups.run_every(args.every, probe=args.probe)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+def _shard_migrate(root: str, tenant: str) -> Dict:
+    db = FinanceDb.for_tenant(tenant, root)
+    return {"tenant": tenant, "schema_version": db.init_db()}
+
+def _shard_report(root: str, tenant: str, start: Optional[str], end: Optional[str]) -> Dict:
+    db = FinanceDb.for_tenant(tenant, root)
+    version = db.init_db()
+    income, expense, n = FinanceRep(db).totals(start, end, None, None)
+    return {"tenant": tenant, "schema_version": version, "transactions": n, "income": income,
+            "expense": expense, "net": income - expense, "size_mb": os.path.getsize(db.path) / 1e6}
+
+def cmd_shards(args) -> int:
+    if not args.tenant_dir:
+        print("Set FINANCE_TENANT_DIR or pass --tenant-dir.", file=sys.stderr)
+        return 2
+    tenants = args.tenants or list_tenants(args.tenant_dir)
+    t0 = time.perf_counter()
+    # SQLite releases the GIL while it works, so shards run concurrently in threads
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        if args.action == "migrate":
+            futures = [pool.submit(_shard_migrate, args.tenant_dir, t) for t in tenants]
+        else:
+            futures = [pool.submit(_shard_report, args.tenant_dir, t, args.start, args.end) for t in tenants]
+        rows, failed = [], 0
+        for tenant, fut in zip(tenants, futures):
+            try:
+                rows.append(fut.result())
+            except Exception as e:
+                rows.append({"tenant": tenant, "error": str(e)}); failed += 1
+    elapsed = time.perf_counter() - t0
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        df = pd.DataFrame(rows)
+        if args.action == "report" and not df.empty and "transactions" in df:
+            total = df[["transactions", "income", "expense", "net", "size_mb"]].sum()
+            df = pd.concat([df, pd.DataFrame([{"tenant": "TOTAL", **total.to_dict()}])], ignore_index=True)
+        print(df.to_string(index=False, float_format=lambda v: f"{v:,.2f}") if not df.empty else "No shards found.")
+    print(f"{len(tenants)} shard(s) in {elapsed:.2f}s, {failed} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+def cmd_report(args) -> int:
+    if args.jobs:
+        jobs = load_jobs(args.jobs)
+    else:
+        dbs = args.dbs or ([os.path.join(args.tenant_dir, f"tenant_{t}.db") for t in list_tenants(args.tenant_dir)]
+                           if args.tenant_dir else [args.db])
+        jobs = expand_jobs(dbs, [parse_range(r) for r in args.range or [":"]], args.type, args.categories)
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    writer = ReportWriter(out, args.format)
+    t0 = time.perf_counter()
+    done = failed = 0
+    try:
+        for row in run_jobs(jobs, args.workers, args.months, not args.no_prompt):
+            writer.write(row)
+            done += 1; failed += bool(row.get("error"))
+    finally:
+        if args.out:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{done} job(s) in {elapsed:.2f}s ({done / elapsed if elapsed else 0:,.1f} jobs/s, "
+          f"{args.workers} worker(s)), {failed} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m finance.cli", description="Finance tracker maintenance commands.")
+    p.add_argument("--db", default=DB_PATH, help="SQLite database file (default: %(default)s)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations").set_defaults(func=cmd_migrate)
+    sub.add_parser("check-plans", help="fail if a known query plan falls back to a table scan").set_defaults(func=cmd_check_plans)
+    rollup = sub.add_parser("rollup", help="verify (or rebuild) the monthly_category_totals rollup")
+    rollup.add_argument("--rebuild", action="store_true", help="recompute the rollup from transactions first")
+    rollup.set_defaults(func=cmd_rollup)
+    fts = sub.add_parser("search-index", help="verify (or rebuild) the full-text index over descriptions")
+    fts.add_argument("--rebuild", action="store_true", help="re-index every description first")
+    fts.set_defaults(func=cmd_search_index)
+    imp = sub.add_parser("import", help="bulk-load bank CSV/OFX statements")
+    imp.add_argument("files", nargs="+")
+    imp.add_argument("--format", choices=["csv", "ofx"], help="override detection by file extension")
+    imp.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    imp.add_argument("--show-rejects", type=int, default=20, metavar="N", help="print the first N rejected rows")
+    imp.add_argument("--strict", action="store_true", help="exit non-zero if any row was rejected")
+    imp.add_argument("--duplicates", choices=["skip", "flag"], default="skip",
+                     help="skip rows already in the database (default) or insert and list them")
+    imp.set_defaults(func=cmd_import)
+    dd = sub.add_parser("dedupe", help="find transactions with identical content (and delete all but the oldest)")
+    dd.add_argument("--apply", action="store_true", help="delete the duplicates; without it only lists them")
+    dd.add_argument("--show", type=int, default=50, metavar="N", help="print the first N duplicate rows")
+    dd.set_defaults(func=cmd_dedupe)
+    exp = sub.add_parser("export", help="stream filtered transactions and the KPI summary to CSV, gzip CSV or Parquet")
+    exp.add_argument("out", help="output file (format from the extension) or - for stdout")
+    exp.add_argument("--format", choices=list(FORMATS))
+    exp.add_argument("--start", help="YYYY-MM-DD")
+    exp.add_argument("--end", help="YYYY-MM-DD")
+    exp.add_argument("--type", choices=["INCOME", "EXPENSE"])
+    exp.add_argument("--categories", type=int, nargs="+", metavar="ID")
+    exp.add_argument("--search", help="full-text search over descriptions, as in the search box")
+    exp.add_argument("--no-summary", action="store_true", help="leave out the KPI summary")
+    exp.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    exp.set_defaults(func=cmd_export)
+    arc = sub.add_parser("archive", help="move closed years to Parquet files (needs pyarrow)")
+    arc.add_argument("--year", type=int, nargs="+", help="archive these years")
+    arc.add_argument("--before", type=int, metavar="YEAR", help="archive every year before YEAR")
+    arc.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return the space to the OS")
+    arc.set_defaults(func=cmd_archive)
+    bk = sub.add_parser("backup", help="online snapshots (SQLite backup API) with retention, verification and restore")
+    bk.add_argument("action", choices=["snapshot", "list", "verify", "restore", "schedule"])
+    bk.add_argument("snapshot", nargs="?", help="verify/restore: snapshot path, file name or 'latest' (default)")
+    bk.add_argument("--to", metavar="NEW_PATH", help="restore into this file (must not exist)")
+    bk.add_argument("--dir", help="snapshot directory (default: BACKUP_DIR, else <db>.backups)")
+    bk.add_argument("--keep", type=int, default=BACKUP_KEEP, help="newest snapshots to keep")
+    bk.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages copied per step (-1 = one step)")
+    bk.add_argument("--sleep-ms", type=float, default=BACKUP_SLEEP_MS, help="pause between steps")
+    bk.add_argument("--every", type=float, default=BACKUP_INTERVAL_SECS or 3600, help="schedule: seconds between snapshots")
+    bk.add_argument("--probe", action="store_true", help="time a small read before and during the copy (latency impact)")
+    bk.add_argument("--quick", action="store_true", help="PRAGMA quick_check instead of the full integrity_check")
+    bk.add_argument("--json", action="store_true", help="snapshot: print the report as JSON")
+    bk.set_defaults(func=cmd_backup)
+    shards = sub.add_parser("shards", help="run migrations or an aggregate report across tenant shards")
+    shards.add_argument("action", choices=["migrate", "report"])
+    shards.add_argument("--tenant-dir", default=TENANT_DIR, help="shard directory (default: FINANCE_TENANT_DIR)")
+    shards.add_argument("--tenants", nargs="+", help="limit to these tenant ids (default: every shard)")
+    shards.add_argument("--workers", type=int, default=8)
+    shards.add_argument("--start", help="report range start (YYYY-MM-DD)")
+    shards.add_argument("--end", help="report range end (YYYY-MM-DD)")
+    shards.add_argument("--json", action="store_true", help="one JSON object per shard")
+    shards.set_defaults(func=cmd_shards)
+    rep = sub.add_parser("report", help="KPI/insight reports for many (database, date range) jobs, in parallel")
+    rep.add_argument("--jobs", help="CSV or JSON-lines file with db,start,end[,type,categories,name] per job")
+    rep.add_argument("--dbs", nargs="+", help="databases to report on (default: --db, or every shard with --tenant-dir)")
+    rep.add_argument("--tenant-dir", help="report on every tenant shard in this directory")
+    rep.add_argument("--range", action="append", metavar="START:END",
+                     help="date range, either side may be empty; repeat for several (default: all time)")
+    rep.add_argument("--type", choices=["INCOME", "EXPENSE"])
+    rep.add_argument("--categories", type=int, nargs="+", metavar="ID")
+    rep.add_argument("--months", type=int, default=3, help="recent months summarized in the AI prompt")
+    rep.add_argument("--no-prompt", action="store_true", help="skip building the AI prompt summary")
+    rep.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    rep.add_argument("--out", help="write here instead of stdout")
+    rep.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (1 runs in-process)")
+    rep.set_defaults(func=cmd_report)
+    return p
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
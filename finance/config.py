@@ -3,5 +3,75 @@ from dotenv import load_dotenv
 
 load_dotenv()
 APP_NAME = os.getenv("APP_NAME", "AI Finance Tracker")
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "finance.db")
+DB_PATH = os.getenv("FINANCE_DB", os.path.join(os.path.dirname(os.path.dirname(__file__)), "finance.db"))
 YELLOW_COLORS = ["#fbbf24", "#facc15", "#f59e0b", "#fde047", "#fffbeb",  "#fef08a"]
+
+# --- SQLite connection pool ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+DB_PRAGMAS = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),  # negative = KiB
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": os.getenv("DB_TEMP_STORE", "MEMORY"),
+    "foreign_keys": "ON",
+}
+# --- per-tenant shards: set FINANCE_TENANT_DIR to give each tenant its own SQLite file ---
+TENANT_DIR = os.getenv("FINANCE_TENANT_DIR", "")
+DEFAULT_TENANT = os.getenv("FINANCE_DEFAULT_TENANT", "default")
+DB_MAX_OPEN_SHARDS = int(os.getenv("DB_MAX_OPEN_SHARDS", "32"))  # files with open connections at once
+# how often (seconds) to poll PRAGMA data_version for writes from other processes
+DB_VERSION_PROBE_SECS = float(os.getenv("DB_VERSION_PROBE_SECS", "2"))
+
+# --- single writer: FinanceRep writes are queued and group-committed by one thread ---
+WRITER_BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", "64"))  # max writes per commit (1 = no grouping)
+WRITER_MAX_LATENCY_MS = float(os.getenv("WRITER_MAX_LATENCY_MS", "0"))  # extra wait for writes to join a batch
+WRITER_TIMEOUT_SECS = float(os.getenv("WRITER_TIMEOUT_SECS", "30"))  # caller gives up waiting after this
+WRITER_IDLE_SECS = float(os.getenv("WRITER_IDLE_SECS", "60"))  # an idle writer thread exits (one per shard)
+
+# --- read cache ---
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "512"))
+
+# --- cold-history archive (Parquet, needs pyarrow) ---
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+ARCHIVE_ROW_GROUP = int(os.getenv("ARCHIVE_ROW_GROUP", "65536"))
+
+# --- online backups (SQLite backup API, in page steps so live sessions keep going) ---
+BACKUP_DIR = os.getenv("BACKUP_DIR", "")  # default: <db>.backups/
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "1024"))  # pages copied per step (-1 = all at once)
+BACKUP_SLEEP_MS = float(os.getenv("BACKUP_SLEEP_MS", "2"))  # pause between steps for other connections
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))  # then copy in one read transaction
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))  # newest snapshots kept
+BACKUP_INTERVAL_SECS = float(os.getenv("BACKUP_INTERVAL_SECS", "0"))  # snapshots from the app process; 0 = off
+
+# --- bulk import ---
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "50000"))
+
+# --- export: rows read from the database per chunk ---
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+
+# --- charts ---
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "128"))
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_DPI = int(os.getenv("CHART_DPI", "110"))
+CHART_HEATMAP_ROWS = int(os.getenv("CHART_HEATMAP_ROWS", "30"))  # categories shown, most over budget first
+CHART_TREND_POINTS = int(os.getenv("CHART_TREND_POINTS", "400"))  # per series; longer ones keep each bin's min and max
+CHART_TREND_RENDERER = os.getenv("CHART_TREND_RENDERER", "matplotlib")  # or "native" (st.line_chart, Vega-Lite)
+
+# --- AI advice ---
+AI_CACHE_TTL_SECS = float(os.getenv("AI_CACHE_TTL_SECS", str(24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "500"))
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini")  # "gemini" or "local" (deterministic stub)
+AI_TIMEOUT_SECS = float(os.getenv("AI_TIMEOUT_SECS", "60"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_MAX_PENDING = int(os.getenv("AI_MAX_PENDING", "8"))
+AI_LOCAL_DELAY_MS = float(os.getenv("AI_LOCAL_DELAY_MS", "0"))
+
+# --- profiling (opt-in) ---
+PROFILE_ENABLED = os.getenv("FINANCE_PROFILE", "0") == "1"
+PROFILE_LOG = os.getenv("FINANCE_PROFILE_LOG", "0") == "1"  # one JSON log line per call
+PROFILE_PORT = int(os.getenv("FINANCE_PROFILE_PORT", "0"))  # 0 = no /metrics endpoint
+PROFILE_MEMORY = os.getenv("FINANCE_PROFILE_MEMORY", "1") == "1"  # deep DataFrame memory (costs a scan)
@@ -1,42 +1,212 @@
+import atexit
+import os
+import re
 import sqlite3
-from .config import DB_PATH
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .config import (DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_BUSY_TIMEOUT, DB_STATEMENT_CACHE, DB_PRAGMAS,
+                     DB_VERSION_PROBE_SECS, TENANT_DIR, DB_MAX_OPEN_SHARDS)
+from .migrations import migrate
+from .metrics import trace_connection, checkin, register_source
 
-class FinanceDb:
-    def __init__(self, path: str = DB_PATH):
+class ConnectionPool:
+    def __init__(self, path: str, size: int = DB_POOL_SIZE):
         self.path = path
+        self.size = size
+        self._idle: LifoQueue = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._all = []
+        self._busy = 0
+        self.last_used = 0.0
+        self._lock = threading.Lock()
+        # bumped whenever a checkout modified rows, or another process committed (see data_version)
+        self.version = 0
+        self._probe = None
+        self._probe_version = None
+        self._probed_at = 0.0
+        # results of one-time bootstrap steps (schema, seed data) for this file in this process
+        self.booted: Dict[str, Any] = {}
+        self.boot_lock = threading.RLock()
 
-    def connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES)
-        conn.execute("PRAGMA foreign_keys = ON;")
+    def _open(self) -> sqlite3.Connection:
+        trim_open_pools(self)
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, timeout=DB_BUSY_TIMEOUT,
+                               cached_statements=DB_STATEMENT_CACHE, check_same_thread=False)
+        for name, value in DB_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value};").fetchall()
+        trace_connection(conn)
+        with self._lock:
+            self._all.append(conn)
         return conn
 
-    def init_db(self):
+    def held(self):
+        return getattr(self._local, "conn", None)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # re-entrant: nested use on the same thread shares the outer connection/transaction
+        held = self.held()
+        if held is not None:
+            yield held
+            return
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise sqlite3.OperationalError(f"No free connection for {self.path} (pool size {self.size}).")
+        try:
+            with self._lock:
+                self._busy += 1
+                self.last_used = time.monotonic()
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                conn = self._open()
+            self._local.conn = conn
+            changes = conn.total_changes
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self._local.conn = None
+                checkin(conn)
+                if conn.total_changes != changes:
+                    self.bump()
+                self._idle.put(conn)
+        finally:
+            with self._lock:
+                self._busy -= 1
+            self._slots.release()
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+
+    def data_version(self) -> int:
+        now = time.monotonic()
+        if now - self._probed_at >= DB_VERSION_PROBE_SECS:
+            if self._probe is None:
+                trim_open_pools(self)
+            with self._lock:
+                if self._probe is None:
+                    self._probe = sqlite3.connect(self.path, check_same_thread=False)
+                v = self._probe.execute("PRAGMA data_version;").fetchone()[0]
+                if self._probe_version is not None and v != self._probe_version:
+                    self.version += 1
+                self._probe_version, self._probed_at = v, now
+        return self.version
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "open": len(self._all), "idle": self._idle.qsize()}
+
+    def is_open(self) -> bool:
+        return bool(self._all) or self._probe is not None
+
+    def close(self, only_idle: bool = False) -> bool:
+        # close every connection (only_idle: unless one is checked out); the pool reopens lazily
+        with self._lock:
+            if only_idle and self._busy:
+                return False
+            conns, self._all = self._all, []
+            while True:
+                try: self._idle.get_nowait()
+                except Empty: break
+            if self._probe is not None:
+                conns.append(self._probe); self._probe = None; self._probe_version = None
+            # writes by other processes while closed can't be seen by the next probe: drop cached reads
+            self.version += 1
+        for conn in conns:
+            conn.close()
+        return True
+
+# Pool objects live for the process (they carry the file's once() state), but only the most
+# recently used DB_MAX_OPEN_SHARDS files keep connections open. Closing a file also drops
+# the entries other registries keep per path (read caches, idle writers) via on_release.
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(path: str) -> ConnectionPool:
+    with _POOLS_LOCK:
+        pool = _POOLS.get(path)
+        if pool is None:
+            pool = _POOLS[path] = ConnectionPool(path)
+        return pool
+
+_RELEASE_HOOKS: List[Callable[[str], None]] = []
+
+def on_release(hook: Callable[[str], None]):
+    _RELEASE_HOOKS.append(hook)
+
+def trim_open_pools(keep: ConnectionPool):
+    # called before `keep` opens a connection: close the least recently used idle files over the cap
+    with _POOLS_LOCK:
+        others = sorted((p for p in _POOLS.values() if p is not keep and p.is_open()), key=lambda p: p.last_used)
+        excess = len(others) + 1 - DB_MAX_OPEN_SHARDS
+        for stale in others:
+            if excess <= 0:
+                break
+            if stale.close(only_idle=True):
+                excess -= 1
+                for hook in _RELEASE_HOOKS:
+                    hook(stale.path)
+
+def open_pools() -> int:
+    with _POOLS_LOCK:
+        return sum(p.is_open() for p in _POOLS.values())
+
+def close_pools():
+    # shutdown: close every file's connections (WAL checkpoints on the last close)
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_pools)
+register_source("db:pools", lambda: {"files": len(_POOLS), "open": open_pools(), "max_open": DB_MAX_OPEN_SHARDS})
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+def shard_path(tenant: str, root: str = TENANT_DIR) -> str:
+    if not root:
+        raise ValueError("FINANCE_TENANT_DIR is not set.")
+    if not _TENANT_RE.match(tenant or ""):
+        raise ValueError(f"Invalid tenant id: {tenant!r}")
+    return os.path.join(root, f"tenant_{tenant}.db")
+
+def list_tenants(root: str = TENANT_DIR) -> List[str]:
+    if not root or not os.path.isdir(root):
+        return []
+    return sorted(name[len("tenant_"):-len(".db")] for name in os.listdir(root)
+                  if name.startswith("tenant_") and name.endswith(".db"))
+
+class FinanceDb:
+    def __init__(self, path: str = DB_PATH, tenant: Optional[str] = None):
+        self.path = path
+        self.tenant = tenant
+        self.pool = get_pool(path)
+
+    @classmethod
+    def for_tenant(cls, tenant: str, root: str = TENANT_DIR) -> "FinanceDb":
+        # the shard file is created (and migrated by init_db) on the tenant's first visit
+        path = shard_path(tenant, root)
+        os.makedirs(root, exist_ok=True)
+        return cls(path, tenant)
+
+    def connect(self):
+        return self.pool.connection()
+
+    def once(self, name: str, fn: Callable[[], Any]) -> Any:
+        with self.pool.boot_lock:
+            if name not in self.pool.booted:
+                self.pool.booted[name] = fn()
+            return self.pool.booted[name]
+
+    def _migrate(self) -> int:
         with self.connect() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE'))
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    description TEXT,
-                    amount REAL NOT NULL CHECK (amount > 0),
-                    category_id INTEGER NOT NULL,
-                    type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE')),
-                    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS budgets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_id INTEGER UNIQUE NOT NULL,
-                    monthly_limit REAL NOT NULL CHECK (monthly_limit >= 0),
-                    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
-                );
-            """)
-            conn.commit()
+            version = migrate(conn)
+        self.pool.bump()
+        return version
+
+    def init_db(self) -> int:
+        return self.once("schema", self._migrate)
@@ -0,0 +1,108 @@
+import io
+import json
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Optional
+import pandas as pd
+from .config import EXPORT_CHUNK_ROWS
+from .repository import FinanceRep
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+
+# Exports stream FinanceRep.iter_trans chunks through an encoder that yields bytes, so
+# memory holds one chunk (plus the encoder's buffer) however many rows are exported.
+FORMATS = {"csv": ("text/csv", "csv"), "csv.gz": ("application/gzip", "csv.gz"),
+           "parquet": ("application/vnd.apache.parquet", "parquet")}
+
+def available_formats() -> List[str]:
+    return [f for f in FORMATS if f != "parquet" or pa is not None]
+
+def kpi_summary(repo: FinanceRep, start: Optional[str], end: Optional[str], typ: Optional[str],
+                category_ids: Optional[List[int]], search: Optional[str] = None) -> Dict:
+    income, expense, n = repo.totals(start, end, typ, category_ids, search)
+    return {"start": start, "end": end, "type": typ or "All", "categories": list(category_ids or []),
+            "search": search, "transactions": n, "income": round(income, 2), "expense": round(expense, 2),
+            "net": round(income - expense, 2), "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def csv_bytes(chunks: Iterator[pd.DataFrame], summary: Optional[Dict] = None) -> Iterator[bytes]:
+    # the KPI summary leads as "# key,value" lines (pandas: read_csv(..., comment="#"))
+    if summary:
+        cell = lambda v: ";".join(map(str, v)) if isinstance(v, list) else ("" if v is None else v)
+        yield "".join(f"# {k},{cell(v)}\n" for k, v in summary.items()).encode()
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+
+def gzip_bytes(parts: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for part in parts:
+        out = z.compress(part)
+        if out:
+            yield out
+    yield z.flush()
+
+class _Drain(io.RawIOBase):
+    # write-only sink ParquetWriter can write to; take() hands back what it wrote so far
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.parts.append(bytes(b)); self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts); self.parts = []
+        return out
+
+def parquet_bytes(chunks: Iterator[pd.DataFrame], summary: Optional[Dict] = None) -> Iterator[bytes]:
+    # one row group per chunk; the KPI summary goes in the file metadata under "finance.summary"
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet export (pip install pyarrow).")
+    schema = pa.schema([("id", pa.int64()), ("date", pa.string()), ("description", pa.string()),
+                        ("amount", pa.float64()), ("category_id", pa.int64()), ("type", pa.string()),
+                        ("category", pa.string())],
+                       metadata={"finance.summary": json.dumps(summary)} if summary else None)
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+def export_bytes(repo: FinanceRep, fmt: str, start: Optional[str], end: Optional[str], typ: Optional[str],
+                 category_ids: Optional[List[int]], search: Optional[str] = None, summary: bool = True,
+                 chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    chunks = repo.iter_trans(start, end, typ, category_ids, search, chunk_rows)
+    meta = kpi_summary(repo, start, end, typ, category_ids, search) if summary else None
+    if fmt == "parquet":
+        return parquet_bytes(chunks, meta)
+    parts = csv_bytes(chunks, meta)
+    return gzip_bytes(parts) if fmt == "csv.gz" else parts
+
+def write_export(out: BinaryIO, parts: Iterator[bytes]) -> int:
+    n = 0
+    for part in parts:
+        out.write(part); n += len(part)
+    return n
+
+def export_file(repo: FinanceRep, fmt: str, *filters, search: Optional[str] = None) -> bytes:
+    # for st.download_button, which reads any file-like data fully into bytes anyway (and
+    # rejects spooled temp files); the rows still come from the database chunk by chunk
+    buf = io.BytesIO()
+    write_export(buf, export_bytes(repo, fmt, *filters, search=search))
+    return buf.getvalue()
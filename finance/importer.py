@@ -0,0 +1,222 @@
+import io
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple, Union, IO
+import numpy as np
+import pandas as pd
+from .config import IMPORT_CHUNK_SIZE
+from .repository import FinanceRep, fingerprint
+
+DEFAULT_CATEGORY = {"EXPENSE": "Uncategorized", "INCOME": "Other Income"}
+COLUMN_ALIASES = {
+    "date": ("date", "posted", "booking date", "transaction date", "value date"),
+    "amount": ("amount", "value", "sum"),
+    "type": ("type", "direction", "debit/credit"),
+    "category": ("category", "categories"),
+    "description": ("description", "memo", "payee", "details", "name", "narrative"),
+}
+TYPE_ALIASES = {"EXPENSE": "EXPENSE", "DEBIT": "EXPENSE", "DR": "EXPENSE", "OUT": "EXPENSE",
+                "INCOME": "INCOME", "CREDIT": "INCOME", "CR": "INCOME", "IN": "INCOME"}
+MAX_REJECT_SAMPLES = 1000
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    categories_created: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+    rejects: List[Tuple[int, str]] = field(default_factory=list)
+    duplicate_lines: List[int] = field(default_factory=list)
+    duplicate_action: str = "skip"
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"Imported {self.inserted:,} of {self.rows:,} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_sec:,.0f} rows/s); {self.rejected:,} rejected, "
+                f"{self.duplicates:,} duplicates {'skipped' if self.duplicate_action == 'skip' else 'flagged'}, "
+                f"{self.categories_created} new categories.")
+
+def _detect_format(name: str) -> str:
+    ext = os.path.splitext(name or "")[1].lower()
+    return "ofx" if ext in (".ofx", ".qfx") else "csv"
+
+def _read_csv(src, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for chunk in pd.read_csv(src, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                             skipinitialspace=True, encoding_errors="replace"):
+        cols = {c.strip().lower(): c for c in chunk.columns}
+        out = pd.DataFrame(index=chunk.index)
+        for key, aliases in COLUMN_ALIASES.items():
+            found = next((cols[a] for a in aliases if a in cols), None)
+            out[key] = chunk[found] if found is not None else ""
+        out["line"] = chunk.index + 2  # 1-based, after the header row
+        yield out
+
+OFX_TAG = re.compile(r"<(/?)(\w+)>([^<]*)")
+
+def _ofx_tags(text: IO[str]) -> Iterator[Tuple[str, str, str]]:
+    tail = ""
+    for block in iter(lambda: text.read(1 << 16), ""):
+        buf = tail + block
+        # the last tag may be cut off mid-value; carry it into the next block
+        cut = max(buf.rfind("<"), 0)
+        tail = buf[cut:]
+        yield from OFX_TAG.findall(buf[:cut])
+    yield from OFX_TAG.findall(tail)
+
+def _read_ofx(src, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # OFX 1.x is SGML (unclosed leaf tags), 2.x is XML; a tag scanner over a text stream handles both
+    text = src if isinstance(src, io.TextIOBase) else io.TextIOWrapper(src, encoding="utf-8", errors="replace")
+    rows: List[Dict[str, str]] = []
+    current: Optional[Dict[str, str]] = None
+    n = 0
+    for closing, tag, value in _ofx_tags(text):
+        tag = tag.upper()
+        if tag == "STMTTRN":
+            if closing and current is not None:
+                n += 1
+                rows.append({**current, "line": n})
+                current = None
+                if len(rows) >= chunk_size:
+                    yield _ofx_frame(rows); rows = []
+            elif not closing:
+                current = {}
+        elif current is not None and not closing:
+            current[tag] = value.strip()
+    if rows:
+        yield _ofx_frame(rows)
+
+def _ofx_frame(rows: List[Dict[str, str]]) -> pd.DataFrame:
+    raw = pd.DataFrame(rows)
+    get = lambda k: raw[k].fillna("") if k in raw else pd.Series("", index=raw.index)
+    return pd.DataFrame({
+        "date": get("DTPOSTED").str.slice(0, 8),
+        "amount": get("TRNAMT"),
+        "type": "",
+        "category": "",
+        "description": get("NAME").where(get("NAME") != "", get("MEMO")),
+        "line": raw["line"],
+    })
+
+def _clean(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    date_str = chunk["date"].astype(str).str.strip()
+    dates = pd.to_datetime(date_str, format="%Y-%m-%d", errors="coerce")
+    dates = dates.fillna(pd.to_datetime(date_str, format="%Y%m%d", errors="coerce"))
+
+    amount = pd.to_numeric(chunk["amount"].astype(str).str.replace(r"[,\s]", "", regex=True), errors="coerce")
+    typ = chunk["type"].astype(str).str.strip().str.upper().map(TYPE_ALIASES)
+    # signed bank amounts: negative means money out when no explicit type column is given
+    typ = typ.where(typ.notna() | amount.isna(), np.where(amount < 0, "EXPENSE", "INCOME"))
+    amount = amount.abs().round(2)
+
+    description = chunk["description"].astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.slice(0, 120)
+    category = chunk["category"].astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.slice(0, 50)
+    category = category.where(category != "", typ.map(DEFAULT_CATEGORY))
+
+    reason = pd.Series(np.select(
+        [dates.isna(), amount.isna(), ~(amount > 0), typ.isna()],
+        ["Invalid date.", "Invalid amount.", "Amount must be greater than 0.", "Invalid transaction type."],
+        default=""), index=chunk.index)
+    clean = pd.DataFrame({"date": dates.dt.strftime("%Y-%m-%d"), "description": description,
+                          "amount": amount, "category": category, "type": typ, "line": chunk["line"]})
+    ok = reason == ""
+    return clean[ok], chunk.loc[~ok, "line"].to_frame().assign(reason=reason[~ok])
+
+class Importer:
+    def __init__(self, repo: FinanceRep):
+        self.repo = repo
+
+    def _fingerprints(self, rows: List[Tuple], seen: Dict[int, int]) -> Tuple[List[int], np.ndarray]:
+        # the k-th line with some content in this import gets occurrence k, and is a duplicate when
+        # that fingerprint is already stored: re-importing a statement adds nothing, yet two
+        # identical lines in a fresh statement both go in (and dedupe leaves them alone)
+        fps = []
+        for row in rows:
+            base = fingerprint(*row)
+            k = seen[base] = seen.get(base, 0) + 1
+            fps.append(base if k == 1 else fingerprint(*row, occurrence=k))
+        stored = self.repo.stored_fingerprints(fps)
+        return fps, np.fromiter((fp in stored for fp in fps), dtype=bool, count=len(fps))
+
+    def _category_ids(self, conn, clean: pd.DataFrame, known: Dict[str, int], kinds: Dict[str, str]) -> int:
+        # creates unknown categories with the type of their first row; names are unique across
+        # types, so known/kinds map a name to its id and its type
+        missing = clean.loc[~clean["category"].isin(known), ["category", "type"]].drop_duplicates("category")
+        if not missing.empty:
+            conn.executemany("INSERT OR IGNORE INTO categories (name, type) VALUES (?, ?);",
+                             missing.itertuples(index=False, name=None))
+            names = missing["category"].tolist()
+            q = f"SELECT name, id, type FROM categories WHERE name IN ({','.join('?'*len(names))});"
+            for name, cid, typ in conn.execute(q, names).fetchall():
+                known[name], kinds[name] = cid, typ
+        return len(missing)
+
+    @staticmethod
+    def _add_rejects(report: ImportReport, rejects: pd.DataFrame):
+        report.rejected += len(rejects)
+        room = MAX_REJECT_SAMPLES - len(report.rejects)
+        if room > 0:
+            report.rejects.extend(rejects.head(room).itertuples(index=False, name=None))
+
+    def _write_chunk(self, conn, clean: pd.DataFrame, report: ImportReport, known: Dict[str, int],
+                     kinds: Dict[str, str], seen: Dict[int, int], duplicates: str) -> int:
+        report.categories_created += self._category_ids(conn, clean, known, kinds)
+        kind = clean["category"].map(kinds)
+        wrong = clean["type"] != kind
+        if wrong.any():
+            # e.g. an EXPENSE row in the INCOME category "Salary"
+            self._add_rejects(report, clean.loc[wrong, ["line"]].assign(
+                reason="Category '" + clean.loc[wrong, "category"] + "' is an " + kind[wrong] + " category."))
+            clean = clean[~wrong]
+        cents = (clean["amount"] * 100).round().astype("int64").tolist()
+        dates, descs, types = clean["date"].tolist(), clean["description"].tolist(), clean["type"].tolist()
+        cat_ids = clean["category"].map(known).astype(int).tolist()
+        fps, dup = self._fingerprints(list(zip(dates, cents, types, cat_ids, descs)), seen)
+        report.duplicates += int(dup.sum())
+        room = MAX_REJECT_SAMPLES - len(report.duplicate_lines)
+        if room > 0:
+            report.duplicate_lines.extend(clean["line"].to_numpy()[dup][:room].tolist())
+        keep = ~dup if duplicates == "skip" else np.ones(len(fps), dtype=bool)
+        rows = [r for r, k in zip(zip(dates, descs, cents, cat_ids, types, fps), keep) if k]
+        conn.executemany("""
+            INSERT INTO transactions (date, description, amount_cents, category_id, type, fingerprint)
+            VALUES (?, ?, ?, ?, ?, ?);
+        """, rows)
+        return len(rows)
+
+    def import_file(self, src: Union[str, IO[bytes]], fmt: Optional[str] = None,
+                    chunk_size: int = IMPORT_CHUNK_SIZE, duplicates: str = "skip") -> ImportReport:
+        # duplicates: "skip" leaves out rows already in the database, "flag" inserts and reports them
+        name = src if isinstance(src, str) else getattr(src, "name", "")
+        fmt = (fmt or _detect_format(name)).lower()
+        report = ImportReport(duplicate_action=duplicates)
+        seen: Dict[int, int] = {}
+        t0 = time.perf_counter()
+        cats = self.repo.list_categories()
+        known = dict(zip(cats["name"], cats["id"].astype(int).tolist()))
+        kinds = dict(zip(cats["name"], cats["type"]))
+        own = isinstance(src, str)
+        fh = open(src, "rb") if own else src
+        try:
+            chunks = _read_ofx(fh, chunk_size) if fmt == "ofx" else _read_csv(fh, chunk_size)
+            for chunk in chunks:
+                clean, rejects = _clean(chunk)
+                report.rows += len(chunk)
+                self._add_rejects(report, rejects)
+                if clean.empty:
+                    continue
+                # categories and rows go in as one writer job per chunk, so imports queue behind
+                # (and group-commit with) the app's other writes instead of racing them for the lock
+                report.inserted += self.repo.writer.call(
+                    lambda conn: self._write_chunk(conn, clean, report, known, kinds, seen, duplicates))
+        finally:
+            if own:
+                fh.close()
+        report.seconds = time.perf_counter() - t0
+        return report
@@ -0,0 +1,240 @@
+import functools
+import inspect
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+from .config import PROFILE_ENABLED, PROFILE_LOG, PROFILE_PORT, PROFILE_MEMORY
+
+log = logging.getLogger("finance.metrics")
+
+class Run:
+    # everything recorded on the Streamlit script thread during one rerun
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls: List[Dict[str, Any]] = []
+        self.sql: List[Dict[str, Any]] = []
+        self.depth = 0
+
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def frames(self):
+        calls = pd.DataFrame(self.calls)
+        if not calls.empty:
+            calls = calls.sort_values("at_ms", kind="stable")
+        return calls, pd.DataFrame(self.sql)
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, Dict[str, float]] = {}
+        self.sql: Dict[str, Dict[str, float]] = {}
+        self.runs = 0
+        self.sources: Dict[str, Callable[[], Dict[str, float]]] = {}  # "kind:label" -> live stats
+        self._local = threading.local()
+        self._open: Dict[int, tuple] = {}  # id(conn) -> (statement, t0) of the statement still running
+
+    # --- per-rerun scope ---
+    def begin_run(self) -> Run:
+        run = self._local.run = Run()
+        with self.lock:
+            self.runs += 1
+        return run
+
+    def current(self) -> Optional[Run]:
+        return getattr(self._local, "run", None)
+
+    # --- calls ---
+    def record_call(self, name: str, t0: float, rows: Optional[int], nbytes: Optional[int], depth: int, error: bool):
+        ms = (time.perf_counter() - t0) * 1000
+        with self.lock:
+            agg = self.calls.setdefault(name, {"calls": 0, "errors": 0, "ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": 0})
+            agg["calls"] += 1; agg["errors"] += error; agg["ms"] += ms
+            agg["max_ms"] = max(agg["max_ms"], ms); agg["rows"] += rows or 0; agg["bytes"] += nbytes or 0
+        run = self.current()
+        entry = {"call": name, "ms": round(ms, 3), "rows": rows, "bytes": nbytes, "depth": depth, "error": error}
+        if run is not None:
+            # calls are appended as they finish; at_ms restores start order for the panel
+            entry["at_ms"] = round((t0 - run.started) * 1000, 3)
+            run.calls.append(entry)
+        if PROFILE_LOG:
+            log.info(json.dumps({"event": "call", **entry}))
+
+    # --- SQL: set_trace_callback only reports statement starts, so a statement runs until the
+    # next statement (or checkin) on the same connection; that window includes fetching its rows ---
+    def trace(self, conn: sqlite3.Connection):
+        key = id(conn)
+        def callback(statement: str):
+            now = time.perf_counter()
+            self._close(key, now)
+            if not statement.startswith("--"):  # "-- TRIGGER name" lines are part of the parent statement
+                self._open[key] = (statement, now)
+        conn.set_trace_callback(callback)
+
+    def checkin(self, conn: sqlite3.Connection):
+        self._close(id(conn), time.perf_counter())
+
+    def _close(self, key: int, now: float):
+        opened = self._open.pop(key, None)
+        if opened is None:
+            return
+        statement, t0 = opened
+        ms = (now - t0) * 1000
+        text = normalize(statement)
+        with self.lock:
+            agg = self.sql.setdefault(text, {"count": 0, "ms": 0.0, "max_ms": 0.0})
+            agg["count"] += 1; agg["ms"] += ms; agg["max_ms"] = max(agg["max_ms"], ms)
+        run = self.current()
+        if run is not None:
+            run.sql.append({"sql": text, "ms": round(ms, 3)})
+        if PROFILE_LOG:
+            log.info(json.dumps({"event": "sql", "sql": text, "ms": round(ms, 3)}))
+
+    # --- export ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            snap = {"runs": self.runs, "calls": {k: dict(v) for k, v in self.calls.items()},
+                    "sql": {k: dict(v) for k, v in self.sql.items()}}
+            sources = dict(self.sources)
+        snap["sources"] = {name: fn() for name, fn in sources.items()}
+        return snap
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        out = ["# TYPE finance_reruns_total counter", f"finance_reruns_total {snap['runs']}"]
+        series = [("finance_calls_total", "calls", 1), ("finance_call_errors_total", "errors", 1),
+                  ("finance_call_seconds_total", "ms", 1000), ("finance_call_rows_total", "rows", 1),
+                  ("finance_call_bytes_total", "bytes", 1)]
+        for metric, field, div in series:
+            out.append(f"# TYPE {metric} counter")
+            out += [f'{metric}{{call="{name}"}} {agg[field] / div:g}' for name, agg in sorted(snap["calls"].items())]
+        by_op: Dict[str, List[float]] = {}
+        for text, agg in snap["sql"].items():
+            acc = by_op.setdefault(text.split(" ", 1)[0].upper(), [0, 0.0])
+            acc[0] += agg["count"]; acc[1] += agg["ms"]
+        out.append("# TYPE finance_sql_statements_total counter")
+        out += [f'finance_sql_statements_total{{op="{op}"}} {n}' for op, (n, _) in sorted(by_op.items())]
+        out.append("# TYPE finance_sql_seconds_total counter")
+        out += [f'finance_sql_seconds_total{{op="{op}"}} {ms / 1000:g}' for op, (_, ms) in sorted(by_op.items())]
+        for name, stats in sorted(snap["sources"].items()):
+            kind, _, label = name.partition(":")
+            out += [f'finance_{kind}_{field}{{source="{label}"}} {value:g}' for field, value in stats.items()
+                    if isinstance(value, (int, float))]
+        return "\n".join(out) + "\n"
+
+RECORDER = Recorder()
+
+def normalize(statement: str) -> str:
+    # collapse whitespace and inline literals so one query shape aggregates into one row
+    text = re.sub(r"\s+", " ", statement).strip()
+    text = re.sub(r"'[^']*'", "?", text)
+    return re.sub(r"\b\d+(\.\d+)?\b", "?", text)
+
+def _measure(out: Any):
+    if isinstance(out, pd.DataFrame):
+        return len(out), int(out.memory_usage(index=True, deep=PROFILE_MEMORY).sum())
+    return None, None
+
+def timed(name: str) -> Callable:
+    def wrap(fn: Callable) -> Callable:
+        if not PROFILE_ENABLED:
+            return fn
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen(*args, **kwargs):
+                t0 = time.perf_counter(); error = False
+                try:
+                    yield from fn(*args, **kwargs)
+                except BaseException:
+                    error = True; raise
+                finally:
+                    RECORDER.record_call(name, t0, None, None, 0, error)
+            return gen
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            run = RECORDER.current()
+            depth = run.depth if run is not None else 0
+            if run is not None:
+                run.depth += 1
+            t0 = time.perf_counter(); error = False; out = None
+            try:
+                out = fn(*args, **kwargs)
+                return out
+            except BaseException:
+                error = True; raise
+            finally:
+                if run is not None:
+                    run.depth -= 1
+                RECORDER.record_call(name, t0, *_measure(out), depth, error)
+        return inner
+    return wrap
+
+def instrumented(prefix: str) -> Callable:
+    # class decorator: time every public method as "<prefix>.<method>"
+    def wrap(cls):
+        if PROFILE_ENABLED:
+            for attr, fn in list(vars(cls).items()):
+                if not attr.startswith("_") and inspect.isfunction(fn):
+                    setattr(cls, attr, timed(f"{prefix}.{attr}")(fn))
+        return cls
+    return wrap
+
+def register_source(name: str, stats: Callable[[], Dict[str, float]]):
+    with RECORDER.lock:
+        RECORDER.sources[name] = stats
+
+def unregister_source(name: str):
+    with RECORDER.lock:
+        RECORDER.sources.pop(name, None)
+
+def trace_connection(conn: sqlite3.Connection):
+    if PROFILE_ENABLED:
+        RECORDER.trace(conn)
+
+def checkin(conn: sqlite3.Connection):
+    if PROFILE_ENABLED:
+        RECORDER.checkin(conn)
+
+def begin_run() -> Optional[Run]:
+    if not PROFILE_ENABLED:
+        return None
+    serve(PROFILE_PORT)
+    return RECORDER.begin_run()
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = RECORDER.prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(RECORDER.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404); return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+def serve(port: int) -> Optional[ThreadingHTTPServer]:
+    # local-only endpoint, started once per process on first use
+    global _SERVER
+    if not port:
+        return None
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            threading.Thread(target=_SERVER.serve_forever, name="metrics-http", daemon=True).start()
+        return _SERVER
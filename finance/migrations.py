@@ -0,0 +1,231 @@
+import sqlite3
+import datetime as dt
+from typing import Callable, List, Union
+
+# Append-only: each step runs exactly once, tracked by PRAGMA user_version.
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+def _iso_date(s: str) -> str:
+    try:
+        return dt.date.fromisoformat(s).isoformat()
+    except (TypeError, ValueError):
+        return s
+
+def _cents_and_iso_dates(conn: sqlite3.Connection):
+    # rebuild transactions with integer cents (amount stays readable as a generated column)
+    # and canonical YYYY-MM-DD dates; the rollup switches to integer cents as well
+    conn.create_function("iso_date", 1, _iso_date, deterministic=True)
+    for stmt in split_sql("""
+    DROP TRIGGER IF EXISTS trg_transactions_rollup_ins;
+    DROP TRIGGER IF EXISTS trg_transactions_rollup_del;
+    DROP TRIGGER IF EXISTS trg_transactions_rollup_upd;
+    CREATE TABLE transactions_v4 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL CHECK (date IS date(date)),
+        description TEXT,
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        amount REAL GENERATED ALWAYS AS (amount_cents / 100.0) VIRTUAL,
+        category_id INTEGER NOT NULL,
+        type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE')),
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+    );
+    INSERT INTO transactions_v4 (id, date, description, amount_cents, category_id, type)
+    SELECT id, iso_date(date), description, CAST(round(amount * 100) AS INTEGER), category_id, type FROM transactions;
+    DROP TABLE transactions;
+    ALTER TABLE transactions_v4 RENAME TO transactions;
+    CREATE INDEX ix_transactions_date ON transactions(date);
+    CREATE INDEX ix_transactions_type_date ON transactions(type, date, category_id, amount_cents);
+    CREATE INDEX ix_transactions_category_date ON transactions(category_id, date, type, amount_cents);
+
+    DROP TABLE monthly_category_totals;
+    CREATE TABLE monthly_category_totals (
+        month TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        total_cents INTEGER NOT NULL DEFAULT 0,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, category_id, type)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER trg_transactions_rollup_ins AFTER INSERT ON transactions BEGIN
+        INSERT INTO monthly_category_totals (month, category_id, type, total_cents, n)
+        VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.type, NEW.amount_cents, 1)
+        ON CONFLICT (month, category_id, type) DO UPDATE SET total_cents = total_cents + excluded.total_cents, n = n + 1;
+    END;
+    CREATE TRIGGER trg_transactions_rollup_del AFTER DELETE ON transactions BEGIN
+        UPDATE monthly_category_totals SET total_cents = total_cents - OLD.amount_cents, n = n - 1
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type;
+        DELETE FROM monthly_category_totals
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type AND n <= 0;
+    END;
+    CREATE TRIGGER trg_transactions_rollup_upd AFTER UPDATE OF date, amount_cents, category_id, type ON transactions BEGIN
+        UPDATE monthly_category_totals SET total_cents = total_cents - OLD.amount_cents, n = n - 1
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type;
+        DELETE FROM monthly_category_totals
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type AND n <= 0;
+        INSERT INTO monthly_category_totals (month, category_id, type, total_cents, n)
+        VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.type, NEW.amount_cents, 1)
+        ON CONFLICT (month, category_id, type) DO UPDATE SET total_cents = total_cents + excluded.total_cents, n = n + 1;
+    END;
+    INSERT INTO monthly_category_totals (month, category_id, type, total_cents, n)
+    SELECT substr(date, 1, 7), category_id, type, SUM(amount_cents), COUNT(*) FROM transactions GROUP BY 1, 2, 3;
+    """):
+        conn.execute(stmt)
+
+def _fingerprints(conn: sqlite3.Connection):
+    # content fingerprint per transaction for duplicate detection, backfilled in Python
+    from .repository import fingerprint  # repository imports this module through db
+    conn.create_function("txn_fingerprint", 5, fingerprint, deterministic=True)
+    conn.execute("ALTER TABLE transactions ADD COLUMN fingerprint INTEGER;")
+    conn.execute("UPDATE transactions SET fingerprint = txn_fingerprint(date, amount_cents, type, category_id, description);")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_transactions_fingerprint ON transactions(fingerprint);")
+
+MIGRATIONS: List[Step] = [
+    # 1: baseline schema
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE'))
+    );
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        description TEXT,
+        amount REAL NOT NULL CHECK (amount > 0),
+        category_id INTEGER NOT NULL,
+        type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE')),
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+    );
+    CREATE TABLE IF NOT EXISTS budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER UNIQUE NOT NULL,
+        monthly_limit REAL NOT NULL CHECK (monthly_limit >= 0),
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+    );
+    """,
+    # 2: indexes for get_trans filters/sort and the category/budget joins
+    """
+    CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions(date);
+    CREATE INDEX IF NOT EXISTS ix_transactions_type_date ON transactions(type, date, category_id, amount);
+    CREATE INDEX IF NOT EXISTS ix_transactions_category_date ON transactions(category_id, date, type, amount);
+    CREATE INDEX IF NOT EXISTS ix_categories_type_name ON categories(type, name);
+    """,
+    # 3: monthly rollup kept in sync by triggers, backfilled from existing rows
+    """
+    CREATE TABLE IF NOT EXISTS monthly_category_totals (
+        month TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, category_id, type)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_ins AFTER INSERT ON transactions BEGIN
+        INSERT INTO monthly_category_totals (month, category_id, type, total, n)
+        VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.type, NEW.amount, 1)
+        ON CONFLICT (month, category_id, type) DO UPDATE SET total = total + excluded.total, n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_del AFTER DELETE ON transactions BEGIN
+        UPDATE monthly_category_totals SET total = total - OLD.amount, n = n - 1
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type;
+        DELETE FROM monthly_category_totals
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type AND n <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_upd AFTER UPDATE OF date, amount, category_id, type ON transactions BEGIN
+        UPDATE monthly_category_totals SET total = total - OLD.amount, n = n - 1
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type;
+        DELETE FROM monthly_category_totals
+         WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND type = OLD.type AND n <= 0;
+        INSERT INTO monthly_category_totals (month, category_id, type, total, n)
+        VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.type, NEW.amount, 1)
+        ON CONFLICT (month, category_id, type) DO UPDATE SET total = total + excluded.total, n = n + 1;
+    END;
+    DELETE FROM monthly_category_totals;
+    INSERT INTO monthly_category_totals (month, category_id, type, total, n)
+    SELECT substr(date, 1, 7), category_id, type, SUM(amount), COUNT(*) FROM transactions GROUP BY 1, 2, 3;
+    """,
+    # 4: integer cents + canonical ISO dates
+    _cents_and_iso_dates,
+    # 5: AI advice cache, keyed by sha256(model, prompt)
+    """
+    CREATE TABLE IF NOT EXISTS ai_advice_cache (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        advice TEXT NOT NULL,
+        latency_ms REAL NOT NULL,
+        created_at REAL NOT NULL,
+        last_hit_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS ix_ai_advice_cache_last_hit ON ai_advice_cache(last_hit_at);
+    """,
+    # 6: key/value markers for one-time data bootstrap (e.g. seed_version)
+    """
+    CREATE TABLE IF NOT EXISTS app_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """,
+    # 7: manifest of closed years moved to Parquet (see finance/archive.py)
+    """
+    CREATE TABLE IF NOT EXISTS archive_years (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        rollup_path TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        total_cents INTEGER NOT NULL,
+        archived_at REAL NOT NULL
+    );
+    """,
+    # 8: full-text index over descriptions (external content, kept in sync by triggers)
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_ins AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_del AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_upd AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END;
+    INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');
+    """,
+    # 9: content fingerprints + lookup index, so re-added and re-imported rows are recognized
+    _fingerprints,
+]
+
+def split_sql(script: str) -> List[str]:
+    stmts, buf = [], ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            stmts.append(buf.strip()); buf = ""
+    if buf.strip():
+        stmts.append(buf.strip())
+    return stmts
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection, target: int = len(MIGRATIONS)) -> int:
+    for version in range(schema_version(conn) + 1, target + 1):
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # another process may have applied it while we waited for the write lock
+            if schema_version(conn) < version:
+                step = MIGRATIONS[version - 1]
+                if callable(step):
+                    step(conn)
+                else:
+                    for stmt in split_sql(step):
+                        conn.execute(stmt)
+                conn.execute(f"PRAGMA user_version = {version};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
@@ -0,0 +1,122 @@
+import csv
+import datetime as dt
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from .db import FinanceDb
+from .repository import FinanceRep
+from .services import FinanceService
+
+# Headless KPI/insight reports: one job is (db, start, end[, type, categories]); jobs run in
+# a process pool and each result is a flat dict, written out as JSON lines or CSV.
+FIELDS = ["job", "name", "db", "start", "end", "type", "categories", "transactions", "income", "expense", "net",
+          "savings_rate", "top_expenses", "over_budget", "on_pace", "prompt", "ms", "pid", "error"]
+
+def load_jobs(path: str) -> List[Dict]:
+    # CSV with a header (db,start,end[,type,categories,name]) or JSON lines with the same keys
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            jobs = [json.loads(line) for line in f if line.strip()]
+        else:
+            jobs = list(csv.DictReader(f))
+    for job in jobs:
+        cats = job.get("categories")
+        if isinstance(cats, str):
+            job["categories"] = [int(c) for c in cats.replace(";", " ").replace(",", " ").split()]
+    return jobs
+
+def expand_jobs(dbs: Iterable[str], ranges: Iterable[Tuple[Optional[str], Optional[str]]],
+                typ: Optional[str] = None, categories: Optional[List[int]] = None) -> List[Dict]:
+    return [{"db": db, "start": start, "end": end, "type": typ, "categories": categories}
+            for db in dbs for start, end in ranges]
+
+def parse_range(text: str) -> Tuple[Optional[str], Optional[str]]:
+    # "2025-01-01:2025-03-31", "2025-01-01:" or ":2025-03-31"
+    start, _, end = text.partition(":")
+    return start or None, end or None
+
+# one FinanceRep/FinanceService per database file per worker, so ranges over the same
+# file share its connection pool and read cache
+_SERVICES: Dict[str, FinanceService] = {}
+
+def _service(path: str) -> FinanceService:
+    service = _SERVICES.get(path)
+    if service is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such database: {path}")
+        db = FinanceDb(path)
+        db.init_db()
+        service = _SERVICES[path] = FinanceService(FinanceRep(db))
+    return service
+
+def run_job(job: Dict, months: int = 3, with_prompt: bool = True) -> Dict:
+    from .ai import AiService  # pulls in streamlit; only needed once a job runs
+    t0 = time.perf_counter()
+    start, end, typ = job.get("start") or None, job.get("end") or None, job.get("type") or None
+    cats = job.get("categories") or []
+    row = {"job": job.get("job"), "name": job.get("name"), "db": job["db"], "start": start, "end": end,
+           "type": typ, "categories": cats, "pid": os.getpid()}
+    try:
+        service = _service(os.path.abspath(job["db"]))
+        data = service.finance_insights(start, end, typ, cats)
+        income, expense, net = service.kpis(start, end, typ, cats)
+        # budget status for the last month of the range (this month if it runs past today)
+        today = dt.date.today()
+        budget = service.repo.budget_matrix(start, end, typ, cats)
+        status = budget.month(min(budget.end, today) if budget.end else today)
+        over = status[status["actual"] > status["monthly_limit"]]
+        pace = budget.projection(today)
+        row.update({
+            "transactions": data["count"], "income": round(income, 2), "expense": round(expense, 2), "net": round(net, 2),
+            "savings_rate": data["savings_rate"], "top_expenses": data["top_expenses"],
+            "over_budget": [{"category": c, "limit": l, "actual": a}
+                            for c, l, a in zip(over["category"], over["monthly_limit"], over["actual"])],
+            "on_pace": [{"category": c, "limit": l, "projected": round(p, 2)}
+                        for c, l, p in zip(pace["category"], pace["monthly_limit"], pace["projected"])],
+            "prompt": AiService(None).make_prompt(service, months, start, end, typ, cats) if with_prompt else None,
+        })
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return row
+
+def run_jobs(jobs: List[Dict], workers: int = os.cpu_count() or 1, months: int = 3,
+             with_prompt: bool = True) -> Iterator[Dict]:
+    # yields results as they finish; at most a few jobs per worker are queued at once so a
+    # long job list never sits in memory as futures
+    if workers <= 1:
+        for i, job in enumerate(jobs):
+            yield run_job({**job, "job": i}, months, with_prompt)
+        return
+    pending = iter(enumerate(jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = set()
+        while True:
+            while len(inflight) < workers * 4:
+                nxt = next(pending, None)
+                if nxt is None:
+                    break
+                inflight.add(pool.submit(run_job, {**nxt[1], "job": nxt[0]}, months, with_prompt))
+            if not inflight:
+                return
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+
+class ReportWriter:
+    def __init__(self, out: TextIO, fmt: str = "jsonl"):
+        self.out, self.fmt = out, fmt
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(out, fieldnames=FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, row: Dict):
+        if self._csv is None:
+            self.out.write(json.dumps(row, default=float) + "\n")
+        else:
+            # nested fields become JSON text in their cell
+            self._csv.writerow({k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in row.items()})
+        self.out.flush()
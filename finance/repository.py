@@ -1,8 +1,19 @@
 import re
+import json
+import hashlib
 import datetime as dt
+import numpy as np
 import pandas as pd
-from typing import Optional, Tuple, List
+from pandas.api.types import union_categoricals
+from typing import Optional, Tuple, List, Dict, Iterator, Set
 from .db import FinanceDb
+from .cache import cached, read_cache_for
+from .models import Transaction
+from .metrics import instrumented
+from .writer import writer_for
+from .archive import Archive
+from .search import fts_query
+from .budget import BudgetMatrix, month_starts
 
 def safe_str(s: str, max_len: int = 120) -> str:
     if s is None:
@@ -10,15 +21,95 @@ def safe_str(s: str, max_len: int = 120) -> str:
     s = re.sub(r"\s+", " ", s.strip())
     return s[:max_len]
 
+def fingerprint(date: str, cents: int, typ: str, category_id: int, description: Optional[str],
+                occurrence: int = 1) -> int:
+    # signed 64-bit content hash; descriptions compare after safe_str and case folding. The n-th
+    # of several identical transactions (two coffees on one day) hashes with its occurrence, so
+    # a fingerprint repeats only when the same row was stored twice.
+    key = f"{date}|{int(cents)}|{typ}|{int(category_id)}|{safe_str(description).casefold()}"
+    if occurrence > 1:
+        key += f"|#{int(occurrence)}"
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
 def is_date_valid(s: str) -> bool:
     try:
         dt.date.fromisoformat(s); return True
     except Exception:
         return False
 
+TRANS_COLUMNS = "t.id, t.date, t.description, t.amount, t.category_id, t.type, c.name as category"
+COMPACT_COLUMNS = ("t.id, CAST(julianday(t.date) - 2440587.5 AS INTEGER) as day, t.description, "
+                   "t.amount_cents, t.category_id, t.type, c.name as category")
+COMPACT_CHUNK_ROWS = 100_000
+
+def compact_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "id": raw["id"].to_numpy("int64"),
+        "date": raw["day"].to_numpy("int64").astype("datetime64[D]").astype("datetime64[s]"),
+        "amount_cents": raw["amount_cents"].to_numpy("int64"),
+        "category_id": raw["category_id"].to_numpy("int32"),
+        "type": pd.Categorical(raw["type"], categories=["INCOME","EXPENSE"]),
+        "category": pd.Categorical(raw["category"].astype(str)),
+        "description": raw["description"].fillna("").astype("string").to_numpy(),
+    })
+
+def concat_compact(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    # stack compact frames in order, keeping the categorical columns categorical
+    if not chunks:
+        return compact_frame(pd.DataFrame(columns=["id","day","description","amount_cents","category_id","type","category"]))
+    if len(chunks) == 1:
+        return chunks[0]
+    out = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            out[col] = union_categoricals([c[col] for c in chunks], ignore_order=True)
+        else:
+            out[col] = np.concatenate([c[col].to_numpy() for c in chunks])
+    return pd.DataFrame(out)
+
+def to_cents(amount: float) -> int:
+    return int(round(float(amount) * 100))
+
+def month_bounds(day: dt.date) -> Tuple[str, str]:
+    start = day.replace(day=1)
+    end = (start + dt.timedelta(days=32)).replace(day=1) - dt.timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+def split_months(start: Optional[str], end: Optional[str]):
+    lo = dt.date.fromisoformat(start) if start and is_date_valid(start) else None
+    hi = dt.date.fromisoformat(end) if end and is_date_valid(end) else None
+    first = None if lo is None else dt.date.fromisoformat(month_bounds(lo - dt.timedelta(days=1))[1]) + dt.timedelta(days=1)
+    last = None if hi is None else dt.date.fromisoformat(month_bounds(hi + dt.timedelta(days=1))[0]) - dt.timedelta(days=1)
+    if first and last and first > last:
+        return None, [(lo.isoformat() if lo else None, hi.isoformat() if hi else None)]
+    edges = []
+    if lo and lo < first:
+        edges.append((lo.isoformat(), (first - dt.timedelta(days=1)).isoformat()))
+    if hi and hi > last:
+        edges.append(((last + dt.timedelta(days=1)).isoformat(), hi.isoformat()))
+    months = (first.strftime("%Y-%m") if first else None, last.strftime("%Y-%m") if last else None)
+    return months, edges
+
+TREND_RESOLUTIONS = ("day", "week", "month", "year")
+
+def trend_resolution(lo: dt.date, hi: dt.date) -> str:
+    # finest bucket that keeps a trend line readable over the span
+    days = (hi - lo).days + 1
+    return "day" if days <= 92 else "week" if days <= 731 else "month" if days <= 3653 else "year"
+
+@instrumented("repo")
 class FinanceRep:
     def __init__(self, db: FinanceDb):
         self.db = db
+        self.cache = read_cache_for(db)
+        self.writer = writer_for(db)
+        self.archive = Archive(db)
+
+    @classmethod
+    def for_tenant(cls, tenant: str) -> "FinanceRep":
+        db = FinanceDb.for_tenant(tenant)
+        db.init_db()
+        return cls(db)
 
   
     def add_category(self, name: str, typ: str) -> Tuple[bool, str]:
@@ -26,13 +117,13 @@ class FinanceRep:
         if not name or typ not in ("INCOME","EXPENSE"):
             return False, "Invalid category name/type."
         try:
-            with self.db.connect() as conn:
-                conn.execute("INSERT INTO categories (name, type) VALUES (?, ?);", (name, typ))
+            self.writer.call(lambda conn: conn.execute("INSERT INTO categories (name, type) VALUES (?, ?);", (name, typ)))
             return True, "Category added."
         except Exception as e:
             msg = "Category already exists." if "UNIQUE" in str(e).upper() else str(e)
             return False, msg
 
+    @cached
     def list_categories(self, typ: Optional[str] = None) -> pd.DataFrame:
         q = "SELECT id, name, type FROM categories"
         params = ()
@@ -44,14 +135,14 @@ class FinanceRep:
  
     def add_budget(self, category_id: int, monthly_limit: float):
         if monthly_limit < 0: return False, "Monthly limit must be ≥ 0."
-        with self.db.connect() as conn:
-            conn.execute("""
-                INSERT INTO budgets (category_id, monthly_limit)
-                VALUES (?, ?)
-                ON CONFLICT(category_id) DO UPDATE SET monthly_limit=excluded.monthly_limit;
-            """, (category_id, monthly_limit))
+        self.writer.call(lambda conn: conn.execute("""
+            INSERT INTO budgets (category_id, monthly_limit)
+            VALUES (?, ?)
+            ON CONFLICT(category_id) DO UPDATE SET monthly_limit=excluded.monthly_limit;
+        """, (category_id, monthly_limit)))
         return True, "Budget saved."
 
+    @cached
     def get_budgets(self) -> pd.DataFrame:
         with self.db.connect() as conn:
             return pd.read_sql_query("""
@@ -60,73 +151,551 @@ class FinanceRep:
                 ORDER BY c.type, c.name;
             """, conn)
 
-    def add_trans(self, date: str, description: str, amount: float, category_id: int, typ: str):
+    def add_trans(self, date: str, description: str, amount: float, category_id: int, typ: str,
+                  allow_duplicate: bool = False):
         if not is_date_valid(date): return False, "Invalid date. Use YYYY-MM-DD."
+        date = dt.date.fromisoformat(date).isoformat()
         description = safe_str(description, 120)
-        if amount <= 0: return False, "Amount must be greater than 0."
+        cents = to_cents(amount)
+        if cents <= 0: return False, "Amount must be greater than 0."
         typ = (typ or "").upper()
         if typ not in ("INCOME","EXPENSE"): return False, "Invalid transaction type."
-        try:
-            with self.db.connect() as conn:
+        content = (date, cents, typ, category_id, description)
+        def insert(conn):
+            # checked on the writer thread, so two identical adds can't both pass
+            dup = None if allow_duplicate else conn.execute(
+                "SELECT id FROM transactions WHERE fingerprint=? LIMIT 1;", (fingerprint(*content),)).fetchone()
+            if dup is None:
                 conn.execute("""
-                    INSERT INTO transactions (date, description, amount, category_id, type)
-                    VALUES (?, ?, ?, ?, ?);
-                """, (date, description, amount, category_id, typ))
-            return True, "Transaction added."
+                    INSERT INTO transactions (date, description, amount_cents, category_id, type, fingerprint)
+                    VALUES (?, ?, ?, ?, ?, ?);
+                """, (date, description, cents, category_id, typ, self._free_fingerprint(conn, content)))
+            return dup
+        try:
+            dup = self.writer.call(insert)
         except Exception as e:
             return False, str(e)
+        if dup is not None:
+            return False, f"Duplicate of transaction #{dup[0]} (same date, amount, type, category and description)."
+        return True, "Transaction added."
 
     def update_trans(self, txn_id: int, date: str, description: str, amount: float, category_id: int, typ: str):
         if txn_id <= 0: return False, "Invalid transaction."
         if not is_date_valid(date): return False, "Invalid date."
+        date = dt.date.fromisoformat(date).isoformat()
         description = safe_str(description, 120)
-        if amount <= 0: return False, "Amount must be greater than 0."
+        cents = to_cents(amount)
+        if cents <= 0: return False, "Amount must be greater than 0."
         typ = (typ or "").upper()
         if typ not in ("INCOME","EXPENSE"): return False, "Invalid type."
-        with self.db.connect() as conn:
-            conn.execute("""
-                UPDATE transactions
-                   SET date=?, description=?, amount=?, category_id=?, type=?
-                 WHERE id=?;
-            """, (date, description, amount, category_id, typ, txn_id))
+        content = (date, cents, typ, category_id, description)
+        self.writer.call(lambda conn: conn.execute("""
+            UPDATE transactions
+               SET date=?, description=?, amount_cents=?, category_id=?, type=?, fingerprint=?
+             WHERE id=?;
+        """, (date, description, cents, category_id, typ, self._free_fingerprint(conn, content, txn_id), txn_id)))
         return True, "Transaction updated."
 
+    @staticmethod
+    def _free_fingerprint(conn, content: Tuple, txn_id: int = 0) -> int:
+        # the first occurrence of this content not stored yet (ignoring row txn_id itself)
+        occurrence = 1
+        while True:
+            fp = fingerprint(*content, occurrence=occurrence)
+            if conn.execute("SELECT 1 FROM transactions WHERE fingerprint=? AND id<>? LIMIT 1;",
+                            (fp, txn_id)).fetchone() is None:
+                return fp
+            occurrence += 1
+
     def delete_trans(self, txn_id: int):
-        with self.db.connect() as conn:
-            conn.execute("DELETE FROM transactions WHERE id=?;", (txn_id,))
+        self.writer.call(lambda conn: conn.execute("DELETE FROM transactions WHERE id=?;", (txn_id,)))
 
-    def get_trans(self, start: Optional[str], end: Optional[str],
-                           typ: Optional[str], category_ids: Optional[List[int]]) -> pd.DataFrame:
-        q = """
-            SELECT t.id, t.date, t.description, t.amount, t.category_id, t.type, c.name as category
-            FROM transactions t JOIN categories c ON c.id=t.category_id WHERE 1=1
-        """
+    def _dims(self, typ: Optional[str], category_ids: Optional[List[int]]) -> Tuple[str, List]:
+        q = ""
         params: List = []
-        if start and is_date_valid(start):
-            q += " AND t.date >= ?"; params.append(start)
-        if end and is_date_valid(end):
-            q += " AND t.date <= ?"; params.append(end)
         if typ in ("INCOME","EXPENSE"):
             q += " AND t.type = ?"; params.append(typ)
         if category_ids:
             q += f" AND t.category_id IN ({','.join('?'*len(category_ids))})"
             params.extend(category_ids)
-        q += " ORDER BY t.date DESC, t.id DESC;"
+        return q, params
+
+    def _dates(self, start: Optional[str], end: Optional[str]) -> Tuple[str, List]:
+        q = ""
+        params: List = []
+        if start and is_date_valid(start):
+            q += " AND t.date >= ?"; params.append(dt.date.fromisoformat(start).isoformat())
+        if end and is_date_valid(end):
+            q += " AND t.date <= ?"; params.append(dt.date.fromisoformat(end).isoformat())
+        return q, params
+
+    def _filters(self, start: Optional[str], end: Optional[str],
+                 typ: Optional[str], category_ids: Optional[List[int]]) -> Tuple[str, List]:
+        dq, dp = self._dates(start, end)
+        tq, tp = self._dims(typ, category_ids)
+        return dq + tq, dp + tp
+
+    def _match(self, search: Optional[str]) -> Tuple[str, List]:
+        # FTS5 does the matching; only the matching ids reach the outer query
+        expr = fts_query(search)
+        if expr is None:
+            return "", []
+        return " AND t.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)", [expr]
+
+    def _trans_query(self, start: Optional[str], end: Optional[str],
+                     typ: Optional[str], category_ids: Optional[List[int]],
+                     after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+                     columns: str = TRANS_COLUMNS, search: Optional[str] = None) -> Tuple[str, List]:
+        where, params = self._filters(start, end, typ, category_ids)
+        mq, mp = self._match(search)
+        where += mq; params += mp
+        if after:
+            # keyset: continue strictly below the last (date, id) seen, matching the sort order
+            where += " AND (t.date, t.id) < (?, ?)"; params += [str(after[0]), int(after[1])]
+        q = f"""
+            SELECT {columns}
+            FROM transactions t JOIN categories c ON c.id=t.category_id WHERE 1=1
+        """ + where + " ORDER BY t.date DESC, t.id DESC"
+        if limit:
+            q += " LIMIT ?"; params.append(int(limit))
+        return q + ";", params
+
+    @cached
+    def get_trans(self, start: Optional[str], end: Optional[str],
+                           typ: Optional[str], category_ids: Optional[List[int]], compact: bool = False,
+                           search: Optional[str] = None) -> pd.DataFrame:
+        if compact:
+            return self.get_trans_compact(start, end, typ, category_ids, search)
+        q, params = self._trans_query(start, end, typ, category_ids, search=search)
         with self.db.connect() as conn:
             df = pd.read_sql_query(q, conn, params=params)
+        df = self._with_archive(df, self.archive.read(start, end, typ, category_ids, search=search))
         if not df.empty:
             df["date"] = pd.to_datetime(df["date"]).dt.date
             df["amount"] = pd.to_numeric(df["amount"])
         return df
 
+    def _with_archive(self, df: pd.DataFrame, cold: pd.DataFrame, limit: Optional[int] = None) -> pd.DataFrame:
+        # merge archived rows (raw columns) into a TRANS_COLUMNS frame, keeping date/id DESC order
+        if cold.empty:
+            return df
+        names = self.list_categories().set_index("id")["name"]
+        cold = cold.assign(amount=cold["amount_cents"] / 100.0,
+                           category=cold["category_id"].map(names).fillna("(deleted)"))[list(df.columns)]
+        out = pd.concat([df, cold], ignore_index=True) if not df.empty else cold
+        out = out.sort_values(["date", "id"], ascending=False, ignore_index=True)
+        return out.head(limit) if limit else out
+
+    def get_trans_compact(self, start: Optional[str], end: Optional[str],
+                          typ: Optional[str], category_ids: Optional[List[int]],
+                          search: Optional[str] = None) -> pd.DataFrame:
+        # id int64, date datetime64, amount_cents int64, category_id int32, type/category categorical;
+        # converted chunk by chunk so the object-dtype intermediate never spans the whole result
+        q, params = self._trans_query(start, end, typ, category_ids, columns=COMPACT_COLUMNS, search=search)
+        with self.db.connect() as conn:
+            chunks = [compact_frame(c) for c in pd.read_sql_query(q, conn, params=params, chunksize=COMPACT_CHUNK_ROWS)]
+        cold = self.archive.read(start, end, typ, category_ids, search=search)
+        if not cold.empty:
+            names = self.list_categories().set_index("id")["name"]
+            cold["day"] = pd.to_datetime(cold["date"]).to_numpy("datetime64[D]").astype("int64")
+            cold["category"] = cold["category_id"].map(names).fillna("(deleted)")
+            chunks.append(compact_frame(cold))
+        out = concat_compact(chunks)
+        if not cold.empty:
+            out = out.sort_values(["date", "id"], ascending=False, ignore_index=True)
+        return out
+
+    @cached
+    def get_trans_page(self, start: Optional[str], end: Optional[str],
+                       typ: Optional[str], category_ids: Optional[List[int]],
+                       after: Optional[Tuple[str, int]] = None, limit: int = 50,
+                       search: Optional[str] = None) -> pd.DataFrame:
+        q, params = self._trans_query(start, end, typ, category_ids, after, limit, search=search)
+        with self.db.connect() as conn:
+            df = pd.read_sql_query(q, conn, params=params)
+        df = self._with_archive(df, self.archive.read(start, end, typ, category_ids, after, limit, search), limit)
+        if not df.empty:
+            df["date"] = pd.to_datetime(df["date"]).dt.date
+            df["amount"] = pd.to_numeric(df["amount"])
+        return df
+
+    def iter_trans(self, start: Optional[str], end: Optional[str],
+                   typ: Optional[str], category_ids: Optional[List[int]], search: Optional[str] = None,
+                   chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        # get_trans a chunk at a time, straight off one cursor (one read snapshot), then the
+        # archived years; only a chunk is in memory at once. Dates stay ISO text.
+        q, params = self._trans_query(start, end, typ, category_ids, search=search)
+        with self.db.connect() as conn:
+            cur = conn.execute(q, params)
+            columns = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+        names = None
+        for cold in self.archive.batches(start, end, typ, category_ids, search, chunk_rows):
+            if names is None:
+                names = self.list_categories().set_index("id")["name"]
+            yield cold.assign(amount=cold["amount_cents"] / 100.0,
+                              category=cold["category_id"].map(names).fillna("(deleted)"))[columns]
+
+    @cached
+    def search(self, text: str, start: Optional[str], end: Optional[str],
+               typ: Optional[str], category_ids: Optional[List[int]], limit: int = 50) -> pd.DataFrame:
+        # best matches first (FTS5 bm25), newest first on ties; archived years have no
+        # index to rank with, so their matches fill any remaining slots by date
+        expr = fts_query(text)
+        where, params = self._filters(start, end, typ, category_ids)
+        q = f"""
+            SELECT {TRANS_COLUMNS}
+            FROM transactions_fts f JOIN transactions t ON t.id=f.rowid JOIN categories c ON c.id=t.category_id
+            WHERE transactions_fts MATCH ?{where} ORDER BY f.rank, t.date DESC, t.id DESC LIMIT ?;
+        """
+        with self.db.connect() as conn:
+            df = pd.read_sql_query(q, conn, params=[expr or '""'] + params + [int(limit)])
+        if expr and len(df) < limit:
+            cold = self._with_archive(df.head(0), self.archive.read(start, end, typ, category_ids,
+                                                                     limit=limit - len(df), search=text))
+            df = pd.concat([df, cold], ignore_index=True) if not cold.empty else df
+        if not df.empty:
+            df["date"] = pd.to_datetime(df["date"]).dt.date
+            df["amount"] = pd.to_numeric(df["amount"])
+        return df
+
+    def count(self, start: Optional[str], end: Optional[str],
+              typ: Optional[str], category_ids: Optional[List[int]], search: Optional[str] = None) -> int:
+        return self.totals(start, end, typ, category_ids, search)[2]
+
+    @cached
+    def get_trans_by_id(self, txn_id: int) -> Optional[Transaction]:
+        with self.db.connect() as conn:
+            row = conn.execute("""
+                SELECT id, date, description, amount, category_id, type FROM transactions WHERE id=?;
+            """, (int(txn_id),)).fetchone()
+        if row is None:
+            return None
+        return Transaction(row[0], dt.date.fromisoformat(row[1]), row[2], float(row[3]), row[4], row[5])
+
+    # ---------- Aggregates ----------
+    def _agg_source(self, start: Optional[str], end: Optional[str],
+                    typ: Optional[str], category_ids: Optional[List[int]],
+                    search: Optional[str] = None) -> Tuple[str, List]:
+        # rows of (month, category_id, type, cents, n): whole months come from the
+        # monthly_category_totals rollup, partial-month edges from raw transactions.
+        # The rollup knows nothing about descriptions, so a search reads matching rows only.
+        mq, mp = self._match(search)
+        months, edges = split_months(start, end) if not mq else (None, [(start, end)])
+        dims, dim_params = self._dims(typ, category_ids)
+        parts, params = [], []
+        if months:
+            q = "SELECT t.month, t.category_id, t.type, t.total_cents as cents, t.n FROM monthly_category_totals t WHERE 1=1"
+            if months[0]:
+                q += " AND t.month >= ?"; params.append(months[0])
+            if months[1]:
+                q += " AND t.month <= ?"; params.append(months[1])
+            parts.append(q + dims); params.extend(dim_params)
+        for lo, hi in edges:
+            dq, dp = self._dates(lo, hi)
+            parts.append("SELECT substr(t.date, 1, 7) as month, t.category_id, t.type, t.amount_cents as cents, 1 as n"
+                         " FROM transactions t WHERE 1=1" + dq + dims + mq)
+            params.extend(dp + dim_params + mp)
+            # archived rows of a partial month are pre-aggregated and passed in as a VALUES list
+            cold = self.archive.read(lo, hi, typ, category_ids, search=search)
+            if not cold.empty:
+                cold = (cold.assign(month=cold["date"].str[:7])
+                        .groupby(["month", "category_id", "type"], as_index=False)["amount_cents"].agg(["sum", "count"]))
+                parts.append("SELECT column1, column2, column3, column4, column5 FROM (VALUES "
+                             + ", ".join(["(?, ?, ?, ?, ?)"] * len(cold)) + ")")
+                params.extend(v for row in cold.itertuples(index=False) for v in
+                              (row.month, int(row.category_id), row.type, int(row.sum), int(row.count)))
+        return " UNION ALL ".join(parts), params
+
+    @cached
+    def totals(self, start: Optional[str], end: Optional[str],
+               typ: Optional[str], category_ids: Optional[List[int]], search: Optional[str] = None) -> Tuple[float, float, int]:
+        src, params = self._agg_source(start, end, typ, category_ids, search)
+        q = f"""
+            SELECT COALESCE(SUM(CASE WHEN s.type='INCOME' THEN s.cents END), 0) / 100.0,
+                   COALESCE(SUM(CASE WHEN s.type='EXPENSE' THEN s.cents END), 0) / 100.0,
+                   COALESCE(SUM(s.n), 0)
+            FROM ({src}) s;
+        """
+        with self.db.connect() as conn:
+            income, expense, n = conn.execute(q, params).fetchone()
+        return float(income), float(expense), int(n)
+
+    @cached
+    def by_category(self, start: Optional[str], end: Optional[str],
+                    typ: Optional[str], category_ids: Optional[List[int]], search: Optional[str] = None) -> pd.DataFrame:
+        src, params = self._agg_source(start, end, typ, category_ids, search)
+        q = f"""
+            SELECT s.category_id, c.name as category, s.type, SUM(s.cents) / 100.0 as amount
+            FROM ({src}) s JOIN categories c ON c.id=s.category_id
+            GROUP BY s.category_id, s.type HAVING SUM(s.n) > 0 ORDER BY amount DESC;
+        """
+        with self.db.connect() as conn:
+            return pd.read_sql_query(q, conn, params=params)
+
+    @cached
+    def by_month(self, start: Optional[str], end: Optional[str],
+                 typ: Optional[str], category_ids: Optional[List[int]], search: Optional[str] = None) -> pd.DataFrame:
+        src, params = self._agg_source(start, end, typ, category_ids, search)
+        q = f"""
+            SELECT s.month, s.type, SUM(s.cents) / 100.0 as amount
+            FROM ({src}) s
+            GROUP BY s.month, s.type HAVING SUM(s.n) > 0 ORDER BY s.month;
+        """
+        with self.db.connect() as conn:
+            df = pd.read_sql_query(q, conn, params=params)
+        df["month"] = pd.to_datetime(df["month"] + "-01")
+        return df
+
+    @cached
+    def data_span(self) -> Tuple[Optional[dt.date], Optional[dt.date]]:
+        # first and last day of the months holding data (archived years included), from the rollup
+        with self.db.connect() as conn:
+            first, last = conn.execute("SELECT MIN(month), MAX(month) FROM monthly_category_totals;").fetchone()
+        if first is None:
+            return None, None
+        return dt.date.fromisoformat(first + "-01"), dt.date.fromisoformat(month_bounds(dt.date.fromisoformat(last + "-01"))[1])
+
+    def trend_resolution(self, start: Optional[str], end: Optional[str]) -> str:
+        first, last = self.data_span()
+        lo = dt.date.fromisoformat(start) if start and is_date_valid(start) else first
+        hi = dt.date.fromisoformat(end) if end and is_date_valid(end) else last
+        return trend_resolution(lo, hi) if lo and hi else "month"
+
+    def _trend_query(self, start: Optional[str], end: Optional[str], typ: Optional[str],
+                     category_ids: Optional[List[int]], resolution: str, search: Optional[str] = None) -> Tuple[str, List]:
+        # (bucket, type, cents, n) per bucket: months and years from the rollup, days grouped in
+        # SQLite straight off the date index, and weeks (from Monday) folded from those days
+        if resolution in ("month", "year"):
+            src, params = self._agg_source(start, end, typ, category_ids, search)
+            bucket = "s.month" if resolution == "month" else "substr(s.month, 1, 4)"
+            return (f"SELECT {bucket} as bucket, s.type, SUM(s.cents) as cents, SUM(s.n) as n FROM ({src}) s"
+                    " GROUP BY 1, 2 HAVING SUM(s.n) > 0 ORDER BY 1;"), params
+        where, params = self._filters(start, end, typ, category_ids)
+        mq, mp = self._match(search)
+        q = (f"SELECT t.date as bucket, t.type, SUM(t.amount_cents) as cents, COUNT(*) as n FROM transactions t"
+             f" WHERE 1=1{where}{mq} GROUP BY 1, 2")
+        if resolution == "week":
+            q = (f"SELECT date(d.bucket, 'weekday 0', '-6 days') as bucket, d.type, SUM(d.cents) as cents,"
+                 f" SUM(d.n) as n FROM ({q}) d GROUP BY 1, 2")
+        return q + " ORDER BY 1;", params + mp
+
+    @cached
+    def trend(self, start: Optional[str], end: Optional[str], typ: Optional[str], category_ids: Optional[List[int]],
+              resolution: str = "month", search: Optional[str] = None) -> pd.DataFrame:
+        # income/expense per day, week (from Monday), month or year: bucket (datetime), type, amount, n
+        if resolution not in TREND_RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        q, params = self._trend_query(start, end, typ, category_ids, resolution, search)
+        with self.db.connect() as conn:
+            df = pd.read_sql_query(q, conn, params=params)
+        if resolution in ("day", "week"):
+            cold = self.archive.read(start, end, typ, category_ids, search=search)
+            if not cold.empty:
+                days = pd.to_datetime(cold["date"])
+                if resolution == "week":
+                    days = days - pd.to_timedelta(days.dt.weekday, unit="D")
+                cold = (cold.assign(bucket=days.dt.strftime("%Y-%m-%d"))
+                        .groupby(["bucket", "type"], as_index=False)["amount_cents"].agg(cents="sum", n="count"))
+                df = (pd.concat([df, cold], ignore_index=True)
+                      .groupby(["bucket", "type"], as_index=False)[["cents", "n"]].sum())
+        suffix = {"day": "", "week": "", "month": "-01", "year": "-01-01"}[resolution]
+        return pd.DataFrame({"bucket": pd.to_datetime(df["bucket"].astype(str) + suffix), "type": df["type"],
+                             "amount": df["cents"].to_numpy("int64") / 100.0, "n": df["n"].to_numpy("int64")})
+
+    @cached
+    def budget_vs_actual(self, month: dt.date, start: Optional[str] = None, end: Optional[str] = None,
+                         typ: Optional[str] = None, category_ids: Optional[List[int]] = None) -> pd.DataFrame:
+        month_start, month_end = month_bounds(month)
+        start = max(start, month_start) if start and is_date_valid(start) else month_start
+        end = min(end, month_end) if end and is_date_valid(end) else month_end
+        return self.budget_matrix(start, end, typ, category_ids).month(month)
+
+    @cached
+    def budget_matrix(self, start: Optional[str], end: Optional[str],
+                      typ: Optional[str], category_ids: Optional[List[int]]) -> BudgetMatrix:
+        # one (month, category) aggregate over the rollup for every budgeted expense category
+        src, params = self._agg_source(start, end, typ, category_ids)
+        with self.db.connect() as conn:
+            limits = pd.read_sql_query("""
+                SELECT c.id as category_id, c.name as category, b.monthly_limit
+                FROM budgets b JOIN categories c ON c.id=b.category_id
+                WHERE c.type='EXPENSE' ORDER BY c.name;
+            """, conn)
+            spend = pd.read_sql_query(f"""
+                SELECT s.month, s.category_id, SUM(s.cents) as cents
+                FROM ({src}) s JOIN budgets b ON b.category_id=s.category_id
+                JOIN categories c ON c.id=s.category_id AND c.type='EXPENSE'
+                WHERE s.type='EXPENSE' GROUP BY 1, 2 ORDER BY 1;
+            """, conn, params=params)
+        lo = dt.date.fromisoformat(start) if start and is_date_valid(start) else None
+        hi = dt.date.fromisoformat(end) if end and is_date_valid(end) else None
+        first = lo or (dt.date.fromisoformat(spend["month"].iloc[0] + "-01") if len(spend) else None)
+        last = hi or (dt.date.fromisoformat(spend["month"].iloc[-1] + "-01") if len(spend) else None)
+        months = month_starts(first.replace(day=1), last.replace(day=1)) if first and last else []
+        return BudgetMatrix(months, limits, spend, lo, hi)
+
+    # ---------- Rollup ----------
+    ROLLUP_SQL = """
+        SELECT substr(date, 1, 7) as month, category_id, type, SUM(amount_cents) as total_cents, COUNT(*) as n
+        FROM transactions GROUP BY 1, 2, 3
+    """
+
+    def _expected_rollup(self, conn) -> str:
+        # live rows plus the rollup snapshots of archived years
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archived_rollup "
+                     "(month TEXT, category_id INTEGER, type TEXT, total_cents INTEGER, n INTEGER);")
+        conn.execute("DELETE FROM temp.archived_rollup;")
+        cold = self.archive.rollups()
+        conn.executemany("INSERT INTO temp.archived_rollup VALUES (?, ?, ?, ?, ?);",
+                         [(m, int(c), t, int(s), int(n)) for m, c, t, s, n in cold.itertuples(index=False)])
+        return f"""
+            SELECT month, category_id, type, SUM(total_cents) as total_cents, SUM(n) as n
+            FROM ({self.ROLLUP_SQL} UNION ALL SELECT * FROM temp.archived_rollup) GROUP BY 1, 2, 3
+        """
+
+    def rebuild_rollup(self) -> int:
+        with self.db.connect() as conn:
+            expected = self._expected_rollup(conn)
+            conn.execute("DELETE FROM monthly_category_totals;")
+            cur = conn.execute(f"INSERT INTO monthly_category_totals (month, category_id, type, total_cents, n) {expected};")
+            return cur.rowcount
+
+    def verify_rollup(self) -> pd.DataFrame:
+        with self.db.connect() as conn:
+            expected = self._expected_rollup(conn)
+            q = f"""
+                SELECT e.month, e.category_id, e.type, e.total_cents as expected_cents, e.n as expected_n,
+                       r.total_cents as rollup_cents, r.n as rollup_n
+                FROM ({expected}) e LEFT JOIN monthly_category_totals r
+                  ON r.month=e.month AND r.category_id=e.category_id AND r.type=e.type
+                WHERE r.n IS NULL OR r.n != e.n OR r.total_cents != e.total_cents
+                UNION ALL
+                SELECT r.month, r.category_id, r.type, NULL, NULL, r.total_cents, r.n
+                FROM monthly_category_totals r LEFT JOIN ({expected}) e
+                  ON e.month=r.month AND e.category_id=r.category_id AND e.type=r.type
+                WHERE e.n IS NULL;
+            """
+            return pd.read_sql_query(q, conn)
+
+    # ---------- Search index ----------
+    def rebuild_search(self):
+        # after loads that bypass the triggers (e.g. bench.synth.bulk_load)
+        with self.db.connect() as conn:
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');")
+
+    def check_search(self) -> Optional[str]:
+        with self.db.connect() as conn:
+            try:
+                conn.execute("INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('integrity-check', 1);")
+            except Exception as e:
+                return str(e)
+        return None
+
+    # ---------- Duplicates ----------
+    def backfill_fingerprints(self) -> int:
+        # rows written without a fingerprint (bulk loads, other tools); with no record of how
+        # they arrived, identical ones all count as one occurrence, i.e. as duplicates
+        with self.db.connect() as conn:
+            conn.create_function("txn_fingerprint", 5, fingerprint, deterministic=True)
+            return conn.execute("""
+                UPDATE transactions SET fingerprint = txn_fingerprint(date, amount_cents, type, category_id, description)
+                 WHERE fingerprint IS NULL;
+            """).rowcount
+
+    def stored_fingerprints(self, fps: List[int]) -> Set[int]:
+        # which of these fingerprints live rows have, one index probe each
+        with self.db.connect() as conn:
+            return {r[0] for r in conn.execute("""
+                SELECT DISTINCT fingerprint FROM transactions WHERE fingerprint IN (SELECT value FROM json_each(?));
+            """, (json.dumps(fps),))}
+
+    def find_duplicates(self) -> pd.DataFrame:
+        # rows stored more than once: the same fingerprint, i.e. the same content *and* occurrence,
+        # so identical lines that were added or imported together are not duplicates of each other.
+        # The repeated fingerprints come from one pass over the fingerprint index, then their
+        # rows are compared column by column (archived years are not checked).
+        with self.db.connect() as conn:
+            df = pd.read_sql_query(f"""
+                SELECT {TRANS_COLUMNS}, t.amount_cents, t.fingerprint
+                FROM transactions t JOIN categories c ON c.id=t.category_id
+                WHERE t.fingerprint IN (SELECT fingerprint FROM transactions GROUP BY 1 HAVING COUNT(*) > 1)
+                ORDER BY t.fingerprint, t.id;
+            """, conn)
+        cols = ["id", "keep_id", "date", "amount", "type", "category", "description"]
+        if df.empty:
+            return pd.DataFrame(columns=cols)
+        key = ["fingerprint", "date", "amount_cents", "type", "category_id", "desc_key"]
+        df["desc_key"] = [safe_str(d).casefold() for d in df["description"]]
+        df["keep_id"] = df.groupby(key)["id"].transform("min")
+        return df.loc[df["id"] != df["keep_id"], cols].reset_index(drop=True)
+
+    def merge_duplicates(self, dups: pd.DataFrame) -> int:
+        # keep the oldest row of each group; the triggers update the rollup and search index
+        ids = [int(i) for i in dups["id"]]
+        if not ids:
+            return 0
+        return self.writer.call(lambda conn: conn.execute(
+            "DELETE FROM transactions WHERE id IN (SELECT value FROM json_each(?));", (json.dumps(ids),)).rowcount)
+
+    # ---------- Query plans ----------
+    def plan_shapes(self) -> Dict[str, Tuple[str, List]]:
+        d = dt.date.today().isoformat()
+        return {
+            "get_trans": self._trans_query(None, None, None, None),
+            "get_trans(range)": self._trans_query(d, d, None, None),
+            "get_trans(range, type)": self._trans_query(d, d, "EXPENSE", None),
+            "get_trans(range, categories)": self._trans_query(d, d, None, [1, 2]),
+            "get_trans(type, categories)": self._trans_query(None, None, "EXPENSE", [1, 2]),
+            "get_trans_page(after)": self._trans_query(None, None, None, None, (d, 10**9), 50),
+            "get_trans_page(range, after)": self._trans_query(d, d, None, None, (d, 10**9), 50),
+            "get_trans(range, search)": self._trans_query(d, d, None, None, search="rent"),
+            "totals(range)": self._agg_shape("SELECT COUNT(*), SUM(s.cents) FROM ({}) s",
+                                             "2024-01-15", d, None, None),
+            "by_category(range, type)": self._agg_shape("SELECT s.category_id, SUM(s.cents) FROM ({}) s GROUP BY 1",
+                                                        "2024-01-15", d, "EXPENSE", None),
+            "trend(range, week)": self._trend_query("2024-01-15", d, None, None, "week"),
+            "trend(range, day, type)": self._trend_query("2024-01-15", d, "EXPENSE", None, "day"),
+            "add_trans(duplicate check)": ("SELECT id FROM transactions WHERE fingerprint=? LIMIT 1;", [1]),
+            "find_duplicates": ("SELECT fingerprint FROM transactions GROUP BY 1 HAVING COUNT(*) > 1;", []),
+            "totals(range, search)": self._agg_shape("SELECT COUNT(*), SUM(s.cents) FROM ({}) s",
+                                                     "2024-01-15", d, None, None, "rent"),
+        }
+
+    def _agg_shape(self, select: str, start, end, typ, category_ids, search=None) -> Tuple[str, List]:
+        src, params = self._agg_source(start, end, typ, category_ids, search)
+        return select.format(src), params
+
+    def scan_violations(self) -> List[Tuple[str, str]]:
+        bad = []
+        with self.db.connect() as conn:
+            for name, (q, params) in self.plan_shapes().items():
+                for row in conn.execute("EXPLAIN QUERY PLAN " + q, params):
+                    detail = row[3]
+                    if re.match(r"SCAN (t|transactions)\b", detail) and "USING" not in detail:
+                        bad.append((name, detail))
+        return bad
+
     # ---------- Seed ----------
+    SEED_VERSION = 1
+
     def seed_defaults(self):
-        cats = self.list_categories()
-        if cats.empty:
-            self.add_category("Salary", "INCOME")
-            self.add_category("Freelance", "INCOME")
-            self.add_category("Rent", "EXPENSE")
-           
-            self.add_category("Dining", "EXPENSE")
-            self.add_category("Transport", "EXPENSE")
-            self.add_category("Groceries", "EXPENSE")
+        # the marker makes this a single indexed lookup once any process has seeded the file
+        def seed(conn):
+            row = conn.execute("SELECT value FROM app_meta WHERE key='seed_version';").fetchone()
+            if row and int(row[0]) >= self.SEED_VERSION:
+                return
+            if conn.execute("SELECT 1 FROM categories LIMIT 1;").fetchone() is None:
+                self.add_category("Salary", "INCOME")
+                self.add_category("Freelance", "INCOME")
+                self.add_category("Rent", "EXPENSE")
+                self.add_category("Dining", "EXPENSE")
+                self.add_category("Transport", "EXPENSE")
+                self.add_category("Groceries", "EXPENSE")
+            conn.execute("INSERT INTO app_meta (key, value) VALUES ('seed_version', ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value=excluded.value;", (str(self.SEED_VERSION),))
+        self.writer.call(seed)
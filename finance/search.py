@@ -0,0 +1,29 @@
+import re
+from typing import List, Optional, Tuple
+
+# Search box syntax: words are ANDed, "quoted words" must appear as a phrase and a trailing *
+# makes the last word a prefix (uber* matches "Uber Eats"). Anything else is punctuation.
+Term = Tuple[List[str], bool]  # (tokens, last token is a prefix)
+
+def search_terms(text: Optional[str]) -> List[Term]:
+    terms: List[Term] = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text or ""):
+        tokens = re.findall(r"\w+", phrase or word)
+        if not tokens:
+            continue
+        if phrase:
+            terms.append((tokens, False))
+        else:
+            # "e-mail" is two tokens to the tokenizer, so keep them adjacent
+            terms.append((tokens, word.endswith("*")))
+    return terms
+
+def fts_query(text: Optional[str]) -> Optional[str]:
+    # every token is quoted so FTS5 operators typed by the user can't raise a syntax error
+    out = ['"' + " ".join(tokens) + '"' + ("*" if prefix else "") for tokens, prefix in search_terms(text)]
+    return " ".join(out) or None
+
+def term_patterns(text: Optional[str]) -> List[str]:
+    # case-insensitive regexes with the same token semantics, for rows outside the FTS index
+    return [r"(?i)\b" + r"\W+".join(re.escape(t) for t in tokens) + ("" if prefix else r"\b")
+            for tokens, prefix in search_terms(text)]
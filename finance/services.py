@@ -1,42 +1,41 @@
 import datetime as dt
-import pandas as pd
-from typing import Tuple
+from typing import Tuple, Optional, List
 from .repository import FinanceRep
+from .metrics import instrumented
 
+@instrumented("service")
 class FinanceService:
     def __init__(self, repo: FinanceRep):
         self.repo = repo
-        self.repo.seed_defaults()
+        repo.db.once("seed", repo.seed_defaults)
 
-    def kpis(self, df: pd.DataFrame) -> Tuple[float, float, float]:
-        if df.empty: return 0.0, 0.0, 0.0
-        income = float(df.loc[df["type"]=="INCOME","amount"].sum())
-        expense = float(df.loc[df["type"]=="EXPENSE","amount"].sum())
+    def kpis(self, start: Optional[str], end: Optional[str],
+             typ: Optional[str], category_ids: Optional[List[int]]) -> Tuple[float, float, float]:
+        income, expense, _ = self.repo.totals(start, end, typ, category_ids)
         return income, expense, income-expense
 
   
-    def finance_insights(self, df: pd.DataFrame):
-        if df.empty:
-            return {"savings_rate": None, "top_expenses": [], "over_msgs": []}
-        income, expense, net = self.kpis(df)
+    def finance_insights(self, start: Optional[str], end: Optional[str],
+                         typ: Optional[str], category_ids: Optional[List[int]]):
+        income, expense, n = self.repo.totals(start, end, typ, category_ids)
+        if not n:
+            return {"count": 0, "savings_rate": None, "top_expenses": [], "over_msgs": [], "pace_msgs": []}
+        net = income-expense
         savings_rate = (net/income*100.0) if income>0 else None
 
-        ex = df[df["type"]=="EXPENSE"]
-        top = ex.groupby("category")["amount"].sum().sort_values(ascending=False).head(3) if not ex.empty else pd.Series(dtype=float)
-        top_list = [(c, float(a)) for c,a in top.items()]
+        by_cat = self.repo.by_category(start, end, typ, category_ids)
+        top = by_cat[by_cat["type"]=="EXPENSE"].head(3)
+        top_list = [(c, float(a)) for c, a in zip(top["category"], top["amount"])]
 
-        budgets = self.repo.get_budgets()
-        over_msgs = []
-        if not budgets.empty:
-            month_start = dt.date.today().replace(day=1)
-            month_end = (month_start + pd.offsets.MonthEnd(0)).date()
-            month_df = df[(df["type"]=="EXPENSE") & (df["date"]>=month_start) & (df["date"]<=month_end)]
-            actual = month_df.groupby("category")["amount"].sum() if not month_df.empty else pd.Series(dtype=float)
+        today = dt.date.today()
+        budgets = self.repo.budget_matrix(start, end, typ, category_ids)
+        b = budgets.month(today)
+        over = b[b["actual"] > b["monthly_limit"]]
+        over_msgs = [f"Over budget in **{c}** by {(a-l):,.0f}"
+                     for c, a, l in zip(over["category"], over["actual"], over["monthly_limit"])]
+        pace = budgets.projection(today)
+        pace_msgs = [f"On pace to exceed **{c}** by {(p-l):,.0f} at month end"
+                     for c, p, l in zip(pace["category"], pace["projected"], pace["monthly_limit"])]
 
-            b = budgets[budgets["type"]=="EXPENSE"][["category","monthly_limit"]].copy()
-            b["actual"] = b["category"].map(actual).fillna(0.0)
-            over = b[b["actual"] > b["monthly_limit"]]
-            for _,r in over.iterrows():
-                over_msgs.append(f"Over budget in **{r['category']}** by {(r['actual']-r['monthly_limit']):,.0f}")
-
-        return {"savings_rate": savings_rate, "top_expenses": top_list, "over_msgs": over_msgs}
+        return {"count": n, "savings_rate": savings_rate, "top_expenses": top_list, "over_msgs": over_msgs,
+                "pace_msgs": pace_msgs}
@@ -0,0 +1,158 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import WRITER_BATCH_SIZE, WRITER_MAX_LATENCY_MS, WRITER_TIMEOUT_SECS, WRITER_IDLE_SECS
+from .db import FinanceDb, ConnectionPool, on_release
+from .metrics import register_source, unregister_source
+
+Job = Callable[[sqlite3.Connection], Any]
+
+class Writer:
+    # One thread owns all FinanceRep writes for a database file. Pending jobs are drained
+    # into a single BEGIN IMMEDIATE ... COMMIT; each job runs in its own savepoint so a
+    # failing write is rolled back alone, and its future resolves only after the commit.
+    def __init__(self, pool: ConnectionPool, batch_size: int = WRITER_BATCH_SIZE,
+                 max_latency_ms: float = WRITER_MAX_LATENCY_MS):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max_latency_ms / 1000
+        self._queue: "queue.Queue[Tuple[Job, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.submitted = self.committed = self.failed = self.batches = 0
+        self.max_depth = 0
+        self.busy_secs = 0.0
+        self.commit_ms_max = 0.0
+
+
+    def submit(self, job: Job) -> Future:
+        fut: Future = Future()
+        held = self.pool.held()
+        if held is not None:
+            # already inside a transaction on this thread (e.g. a nested call): stay in it
+            try:
+                fut.set_result(job(held))
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        with self._lock:
+            self._queue.put((job, fut))
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        return fut
+
+    def call(self, job: Job, timeout: float = WRITER_TIMEOUT_SECS) -> Any:
+        fut = self.submit(job)
+        try:
+            return fut.result(timeout)
+        except FutureTimeout:
+            # still queued: cancel it so the writer skips it and the caller's error is the truth
+            if fut.cancel():
+                raise TimeoutError(f"Write not started within {timeout:g}s; nothing was written.") from None
+            # already inside a transaction: it can't be abandoned halfway, so report how it ends
+            return fut.result()
+
+    def _collect(self) -> Optional[List[Tuple[Job, Future]]]:
+        # whatever queued up during the previous commit goes into this one; max_latency
+        # optionally holds the batch open a little longer for more writers to join
+        try:
+            batch = [self._queue.get(timeout=WRITER_IDLE_SECS)]
+        except queue.Empty:
+            with self._lock:
+                # submit() enqueues under the same lock, so nothing can slip in unserved
+                if self._queue.empty():
+                    self._thread = None
+                    return None
+            batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                if not self.pool.is_open():
+                    _release(self.pool.path)  # the file was trimmed while this thread idled
+                return
+            t0 = time.perf_counter()
+            results = []
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE;")
+                    # a lone job skips the savepoint: rolling back the transaction undoes it just the
+                    # same, and with temp_store=MEMORY a savepoint makes bulk jobs (imports) quadratic
+                    solo = len(batch) == 1
+                    for job, fut in batch:
+                        if not fut.set_running_or_notify_cancel():
+                            continue
+                        if not solo:
+                            conn.execute("SAVEPOINT write;")
+                        try:
+                            results.append((fut, job(conn), None))
+                            if not solo:
+                                conn.execute("RELEASE write;")
+                        except Exception as e:
+                            if solo:
+                                conn.execute("ROLLBACK;")
+                            else:
+                                conn.execute("ROLLBACK TO write;"); conn.execute("RELEASE write;")
+                            results.append((fut, None, e))
+            except Exception as e:
+                # the commit itself failed: nothing in this batch was written
+                results = [(fut, None, e) for _, fut in batch if not fut.done()]
+            elapsed = time.perf_counter() - t0
+            ok = sum(1 for _, _, err in results if err is None)
+            with self._lock:
+                self.batches += 1; self.committed += ok; self.failed += len(results) - ok
+                self.busy_secs += elapsed; self.commit_ms_max = max(self.commit_ms_max, elapsed * 1000)
+            for fut, value, err in results:
+                if err is None:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(err)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.committed + self.failed
+            return {"queue_depth": self._queue.qsize(), "max_queue_depth": self.max_depth,
+                    "submitted": self.submitted, "committed": self.committed, "failed": self.failed,
+                    "batches": self.batches, "avg_batch": done / self.batches if self.batches else 0.0,
+                    "writes_per_sec": done / self.busy_secs if self.busy_secs else 0.0,
+                    "max_commit_ms": self.commit_ms_max}
+
+_WRITERS: Dict[str, Writer] = {}
+_WRITERS_LOCK = threading.Lock()
+
+def writer_for(db: FinanceDb) -> Writer:
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(db.path)
+        if writer is None:
+            writer = _WRITERS[db.path] = Writer(db.pool)
+            register_source(f"writer:{db.path}", writer.stats)
+        return writer
+
+def _release(path: str):
+    # only an idle writer goes: one with a live thread or queued jobs is still serving callers
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(path)
+        if writer is None:
+            return
+        with writer._lock:
+            if writer._thread is not None or not writer._queue.empty():
+                return
+        del _WRITERS[path]
+        unregister_source(f"writer:{path}")
+
+on_release(_release)
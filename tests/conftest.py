@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finance.db import FinanceDb, close_pools
+from finance.repository import FinanceRep
+
+@pytest.fixture
+def repo(tmp_path):
+    db = FinanceDb(str(tmp_path / "finance.db"))
+    db.init_db()
+    repo = FinanceRep(db)
+    repo.seed_defaults()
+    yield repo
+    close_pools()
+
+def category_id(repo: FinanceRep, name: str) -> int:
+    with repo.db.connect() as conn:
+        return conn.execute("SELECT id FROM categories WHERE name=?;", (name,)).fetchone()[0]
@@ -0,0 +1,27 @@
+import pytest
+from finance.ai import AdviceBackend, AdviceCache, LocalBackend
+
+def test_hits_are_reads_and_counted_on_the_next_put(repo):
+    cache = AdviceCache(repo.db)
+    cache.put("m", "prompt", "advice", 1200.0)
+    pool = repo.db.pool
+    version = pool.data_version()
+    assert cache.get("m", "prompt") == "advice"
+    assert cache.get("m", "prompt") == "advice"
+    assert cache.get("m", "other") is None
+    assert pool.data_version() == version
+    assert cache.stats()["lifetime_hits"] == 2
+    cache.put("m", "other", "more", 800.0)
+    with repo.db.connect() as conn:
+        assert conn.execute("SELECT hits FROM ai_advice_cache WHERE key=?;",
+                            (AdviceCache.key("m", "prompt"),)).fetchone()[0] == 2
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["lifetime_hits"] == 2 and stats["lifetime_saved_ms"] == 2400.0
+
+def test_backends_must_implement_stream():
+    class Incomplete(AdviceBackend):
+        name = "incomplete"
+    with pytest.raises(TypeError):
+        Incomplete()
+    words = "".join(LocalBackend(delay_ms=0).stream("Expenses by category:\n- Rent: 900.00\nConstraints:", "m", 1))
+    assert "Rent" in words
@@ -0,0 +1,15 @@
+import datetime as dt
+from conftest import category_id
+
+def test_invalid_bounds_are_ignored_for_archived_years(repo):
+    year = dt.date.today().year - 2
+    rent = category_id(repo, "Rent")
+    assert repo.add_trans(f"{year}-03-01", "rent", 900, rent, "EXPENSE")[0]
+    assert repo.add_trans(f"{year + 1}-03-01", "rent", 950, rent, "EXPENSE")[0]
+    assert repo.archive.archive_year(year)["moved"] == 1
+    bad = f"{year}-02-30"
+    assert len(repo.archive.paths(bad, None)) == 1
+    assert len(repo.archive.read(bad, bad, None, None)) == 1
+    assert len(repo.get_trans(bad, None, None, None)) == 2
+    assert len(repo.archive.read(f"{year}-02-28", None, None, None)) == 1
+    assert repo.archive.read(f"{year}-03-02", None, None, None).empty
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+from finance.backup import Backups
+
+def test_snapshots_only_lists_its_own_names_in_order(repo, tmp_path):
+    root = tmp_path / "backups"
+    root.mkdir()
+    names = ["finance-20250101-120000.db", "finance-20250101-120000-2.db", "finance-20250101-120000-10.db",
+             "finance-20241231-235959.db", "finance-old.db", "finance-eu-20250102-000000.db",
+             "finance-20250101-120000.db.tmp", "finance-20250101-1200.db"]
+    for n in names:
+        (root / n).write_bytes(b"")
+    backups = Backups(repo.db, root=str(root), keep=2)
+    assert [os.path.basename(p) for p in backups.snapshots()] == [
+        "finance-20241231-235959.db", "finance-20250101-120000.db",
+        "finance-20250101-120000-2.db", "finance-20250101-120000-10.db"]
+    backups.prune()
+    assert sorted(os.listdir(root)) == sorted(set(names) - {"finance-20241231-235959.db", "finance-20250101-120000.db"})
+
+def test_snapshot_and_restore(repo, tmp_path):
+    backups = Backups(repo.db, root=str(tmp_path / "backups"), keep=1)
+    first = backups.snapshot().path
+    second = backups.snapshot()
+    assert second.integrity == "ok" and second.pruned == [first]
+    target = str(tmp_path / "restored.db")
+    backups.restore("latest", target)
+    with repo.db.connect() as conn:
+        want = conn.execute("SELECT COUNT(*) FROM categories;").fetchone()[0]
+    assert sqlite3.connect(target).execute("SELECT COUNT(*) FROM categories;").fetchone()[0] == want
@@ -0,0 +1,10 @@
+import pandas as pd
+from ui.charts import _draw_heatmap, fingerprint, render_png
+
+def test_heatmap_key_depends_on_row_labels():
+    months = pd.to_datetime(["2025-01-01", "2025-02-01"])
+    a = pd.DataFrame([[1.5, 0.5], [0.5, 0.5]], index=["Dining", "Groceries"], columns=months)
+    b = pd.DataFrame(a.to_numpy(), index=["Groceries", "Dining"], columns=months)
+    size = (7, 2.0)
+    assert fingerprint(_draw_heatmap.__name__, a, size) != fingerprint(_draw_heatmap.__name__, b, size)
+    assert render_png(_draw_heatmap, size, a) != render_png(_draw_heatmap, size, b)
@@ -0,0 +1,38 @@
+from conftest import category_id
+from finance.importer import Importer
+
+STATEMENT = ("date,amount,category,description\n"
+             "2025-03-01,-4.50,Dining,Coffee\n"
+             "2025-03-01,-4.50,Dining,Coffee\n"
+             "2025-03-02,-30,Groceries,Market\n")
+
+def _rows(repo) -> int:
+    return len(repo.get_trans(None, None, None, None))
+
+def test_import_and_dedupe_agree(repo, tmp_path):
+    src = tmp_path / "march.csv"
+    src.write_text(STATEMENT)
+    importer = Importer(repo)
+    assert importer.import_file(str(src)).inserted == 3
+    # identical lines from one statement are two purchases, not duplicates
+    assert repo.find_duplicates().empty
+    again = importer.import_file(str(src))
+    assert again.inserted == 0 and again.duplicates == 3
+    flagged = importer.import_file(str(src), duplicates="flag")
+    assert flagged.inserted == 3 and flagged.duplicates == 3
+    dups = repo.find_duplicates()
+    assert len(dups) == 3
+    assert repo.merge_duplicates(dups) == 3
+    assert _rows(repo) == 3 and repo.find_duplicates().empty
+    assert importer.import_file(str(src)).inserted == 0
+
+def test_add_and_dedupe_agree(repo):
+    dining = category_id(repo, "Dining")
+    assert repo.add_trans("2025-03-01", "Coffee", 4.5, dining, "EXPENSE")[0]
+    ok, msg = repo.add_trans("2025-03-01", " coffee ", 4.5, dining, "EXPENSE")
+    assert not ok and msg.startswith("Duplicate of transaction #")
+    assert repo.add_trans("2025-03-01", "Coffee", 4.5, dining, "EXPENSE", allow_duplicate=True)[0]
+    assert repo.find_duplicates().empty
+    first = int(repo.get_trans(None, None, None, None)["id"].min())
+    assert repo.update_trans(first, "2025-03-01", "Coffee", 4.5, dining, "EXPENSE")[0]
+    assert repo.find_duplicates().empty
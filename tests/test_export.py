@@ -0,0 +1,22 @@
+import gzip
+import io
+import pandas as pd
+import pytest
+from streamlit.elements.widgets.button import convert_data_to_bytes_and_infer_mime
+from conftest import category_id
+from finance.export import available_formats, export_file
+
+@pytest.mark.parametrize("fmt", ["csv", "csv.gz", "parquet"])
+def test_export_file_is_accepted_by_download_button(repo, fmt):
+    if fmt not in available_formats():
+        pytest.skip("pyarrow is not installed")
+    rent = category_id(repo, "Rent")
+    for day in (1, 2, 3):
+        repo.add_trans(f"2025-01-0{day}", f"rent {day}", 100 * day, rent, "EXPENSE")
+    data, _ = convert_data_to_bytes_and_infer_mime(export_file(repo, fmt, None, None, None, None),
+                                                   unsupported_error=TypeError("unsupported type"))
+    if fmt == "parquet":
+        rows = pd.read_parquet(io.BytesIO(data))
+    else:
+        rows = pd.read_csv(io.BytesIO(gzip.decompress(data) if fmt == "csv.gz" else data), comment="#")
+    assert sorted(rows["amount"].tolist()) == [100.0, 200.0, 300.0]
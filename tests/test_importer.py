@@ -0,0 +1,26 @@
+import io
+from finance.importer import Importer
+
+def _csv(text: str) -> io.BytesIO:
+    src = io.BytesIO(text.encode())
+    src.name = "statement.csv"
+    return src
+
+def test_rows_typed_against_an_existing_category_are_rejected(repo):
+    report = Importer(repo).import_file(_csv(
+        "date,amount,type,category,description\n"
+        "2025-01-31,3000,INCOME,Salary,payroll\n"
+        "2025-02-01,25,EXPENSE,Salary,refund to employer\n"))
+    assert report.inserted == 1 and report.rejected == 1
+    assert report.rejects == [(3, "Category 'Salary' is an INCOME category.")]
+    assert report.categories_created == 0
+    stored = repo.get_trans(None, None, None, None)
+    assert stored[["type", "category"]].values.tolist() == [["INCOME", "Salary"]]
+
+def test_new_category_takes_the_type_of_its_first_row(repo):
+    report = Importer(repo).import_file(_csv(
+        "date,amount,type,category,description\n"
+        "2025-01-02,10,EXPENSE,Pets,food\n"
+        "2025-01-03,40,INCOME,Pets,sold a cage\n"))
+    assert report.categories_created == 1 and report.inserted == 1
+    assert report.rejects == [(3, "Category 'Pets' is an EXPENSE category.")]
@@ -0,0 +1,62 @@
+import sqlite3
+from finance.migrations import MIGRATIONS, migrate, schema_version
+
+BASELINE = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE'))
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL CHECK (amount > 0),
+    category_id INTEGER NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('INCOME', 'EXPENSE')),
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_id INTEGER UNIQUE NOT NULL,
+    monthly_limit REAL NOT NULL CHECK (monthly_limit >= 0),
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+"""
+
+def baseline_db(path) -> sqlite3.Connection:
+    # the schema the app created before migrations existed (user_version 0)
+    conn = sqlite3.connect(str(path))
+    conn.executescript(BASELINE)
+    conn.execute("INSERT INTO categories (id, name, type) VALUES (1, 'Salary', 'INCOME'), (2, 'Dining', 'EXPENSE');")
+    conn.commit()
+    return conn
+
+def test_baseline_migrates_to_latest_once(tmp_path):
+    conn = baseline_db(tmp_path / "old.db")
+    conn.execute("INSERT INTO transactions (date, description, amount, category_id, type) "
+                 "VALUES ('2025-01-05', 'lunch', 12.5, 2, 'EXPENSE');")
+    conn.commit()
+    assert schema_version(conn) == 0
+    assert migrate(conn) == len(MIGRATIONS) == 9
+    schema = conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name;").fetchall()
+    changes = conn.total_changes
+    assert migrate(conn) == 9
+    assert conn.total_changes == changes
+    assert conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name;").fetchall() == schema
+    assert conn.execute("SELECT COUNT(*) FROM transactions;").fetchone()[0] == 1
+
+def test_cents_and_iso_dates_migration_converts_rows(tmp_path):
+    conn = baseline_db(tmp_path / "old.db")
+    migrate(conn, target=3)
+    rows = [("2025-01-05", 12.345), ("20250105", 0.1), ("2025-W01-7", 19.99), ("2025-02-28", 1234567.89)]
+    conn.executemany("INSERT INTO transactions (date, description, amount, category_id, type) "
+                     "VALUES (?, 'x', ?, 2, 'EXPENSE');", rows)
+    conn.commit()
+    migrate(conn)
+    got = conn.execute("SELECT date, amount_cents, amount FROM transactions ORDER BY id;").fetchall()
+    assert [(d, c) for d, c, _ in got] == [
+        ("2025-01-05", 1235), ("2025-01-05", 10), ("2025-01-05", 1999), ("2025-02-28", 123456789)]
+    assert all(isinstance(c, int) and a == c / 100 for _, c, a in got)
+    rollup = conn.execute("SELECT month, total_cents, n FROM monthly_category_totals ORDER BY month;").fetchall()
+    assert rollup == [("2025-01", 3244, 3), ("2025-02", 123456789, 1)]
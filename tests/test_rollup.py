@@ -0,0 +1,30 @@
+from conftest import category_id
+
+def _rollup(repo) -> dict:
+    with repo.db.connect() as conn:
+        return {(m, c, t): (cents, n) for m, c, t, cents, n in
+                conn.execute("SELECT month, category_id, type, total_cents, n FROM monthly_category_totals;")}
+
+def _last_id(repo) -> int:
+    return int(repo.get_trans(None, None, None, None)["id"].max())
+
+def test_rollup_follows_every_write(repo):
+    dining, rent, salary = (category_id(repo, n) for n in ("Dining", "Rent", "Salary"))
+    assert repo.add_trans("2025-01-10", "lunch", 12.5, dining, "EXPENSE")[0]
+    lunch = _last_id(repo)
+    assert repo.add_trans("2025-01-20", "dinner", 30, dining, "EXPENSE")[0]
+    assert repo.verify_rollup().empty
+    assert _rollup(repo) == {("2025-01", dining, "EXPENSE"): (4250, 2)}
+
+    # each of date, amount, category and type moves the row between rollup keys
+    steps = [("2025-02-03", 12.5, dining, "EXPENSE"), ("2025-02-03", 15, dining, "EXPENSE"),
+             ("2025-02-03", 15, rent, "EXPENSE"), ("2025-02-03", 15, salary, "INCOME")]
+    for date, amount, cat, typ in steps:
+        assert repo.update_trans(lunch, date, "lunch", amount, cat, typ)[0]
+        assert repo.verify_rollup().empty
+    assert _rollup(repo) == {("2025-01", dining, "EXPENSE"): (3000, 1), ("2025-02", salary, "INCOME"): (1500, 1)}
+
+    repo.delete_trans(lunch)
+    assert repo.verify_rollup().empty
+    assert _rollup(repo) == {("2025-01", dining, "EXPENSE"): (3000, 1)}
+    assert repo.by_month(None, None, None, None)["amount"].tolist() == [30.0]
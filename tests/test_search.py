@@ -0,0 +1,26 @@
+from conftest import category_id
+
+def _found(repo, text: str) -> list:
+    hot = repo.search(text, None, None, None, None)["description"].tolist()
+    assert sorted(repo.get_trans(None, None, None, None, search=text)["description"]) == sorted(hot)
+    return hot
+
+def test_index_follows_insert_update_delete(repo):
+    dining = category_id(repo, "Dining")
+    assert repo.add_trans("2025-03-01", "Uber Eats order", 18, dining, "EXPENSE")[0]
+    assert repo.add_trans("2025-03-02", "Corner bakery", 4.5, dining, "EXPENSE")[0]
+    txn = int(repo.get_trans(None, None, None, None, search="uber")["id"].iloc[0])
+    assert _found(repo, "uber") == ["Uber Eats order"]
+    assert _found(repo, "bak*") == ["Corner bakery"]
+
+    assert repo.update_trans(txn, "2025-03-01", "Pizza delivery", 18, dining, "EXPENSE")[0]
+    assert _found(repo, "uber") == []
+    assert _found(repo, "pizza") == ["Pizza delivery"]
+    # rows changed without touching the description keep their entry
+    assert repo.update_trans(txn, "2025-03-05", "Pizza delivery", 20, dining, "EXPENSE")[0]
+    assert _found(repo, "pizza") == ["Pizza delivery"]
+
+    repo.delete_trans(txn)
+    assert _found(repo, "pizza") == []
+    assert _found(repo, "corner") == ["Corner bakery"]
+    assert repo.check_search() is None
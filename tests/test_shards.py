@@ -0,0 +1,42 @@
+import time
+import finance.cache as cache
+import finance.db as db
+import finance.writer as writer
+from finance.metrics import RECORDER
+from finance.db import FinanceDb
+from finance.repository import FinanceRep
+
+def test_trimmed_shards_drop_their_cache_and_idle_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_MAX_OPEN_SHARDS", 2)
+    monkeypatch.setattr(writer, "WRITER_IDLE_SECS", 0.05)
+    repos = []
+    for name in ("a", "b", "c"):
+        d = FinanceDb.for_tenant(name, str(tmp_path))
+        d.init_db()
+        repo = FinanceRep(d)
+        repo.seed_defaults()
+        repos.append(repo)
+        time.sleep(0.2)  # let the writer thread go idle and exit
+    first = repos[0].db.path
+    assert not repos[0].db.pool.is_open()
+    assert first not in cache._CACHES and first not in writer._WRITERS
+    assert f"writer:{first}" not in RECORDER.sources
+    assert repos[2].db.path in writer._WRITERS
+    # the released shard reopens on its next visit
+    assert len(FinanceRep(FinanceDb.for_tenant("a", str(tmp_path))).list_categories()) == 6
+
+def test_busy_writer_is_kept(tmp_path):
+    d = FinanceDb(str(tmp_path / "busy.db"))
+    d.init_db()
+    w = writer.writer_for(d)
+    w.submit(lambda conn: time.sleep(0.2))
+    writer._release(d.path)
+    assert writer._WRITERS.get(d.path) is w
+
+def test_close_pools_and_the_pools_source(repo):
+    assert repo.db.pool.is_open()
+    assert RECORDER.sources["db:pools"]()["open"] >= 1
+    version = repo.db.pool.version
+    db.close_pools()
+    assert not repo.db.pool.is_open() and repo.db.pool.version > version
+    assert len(repo.list_categories()) == 6  # reopens on next use
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+from conftest import category_id
+
+ROWS = [("2024-12-29", 10, "Dining", "EXPENSE"), ("2024-12-30", 20.25, "Rent", "EXPENSE"),
+        ("2025-01-01", 3000, "Salary", "INCOME"), ("2025-01-05", 7.5, "Dining", "EXPENSE"),
+        ("2025-01-06", 40, "Groceries", "EXPENSE"), ("2025-01-06", 0.1, "Dining", "EXPENSE"),
+        ("2025-02-15", 500, "Freelance", "INCOME"), ("2025-03-31", 12.34, "Transport", "EXPENSE"),
+        ("2025-04-01", 9.99, "Dining", "EXPENSE")]
+# weeks run Monday to Sunday and are labelled with their Monday
+RULES = {"day": dict(rule="D"), "week": dict(rule="W-MON", label="left", closed="left"),
+         "month": dict(rule="MS"), "year": dict(rule="YS")}
+
+def _expected(start, end, resolution: str) -> pd.DataFrame:
+    df = pd.DataFrame(ROWS, columns=["date", "amount", "category", "type"])
+    df = df[(df["date"] >= start) & (df["date"] <= end)].assign(date=lambda d: pd.to_datetime(d["date"]))
+    out = []
+    for typ, part in df.groupby("type"):
+        rs = part.set_index("date")["amount"].resample(**RULES[resolution]).agg(["sum", "count"])
+        rs = rs[rs["count"] > 0]
+        out.append(pd.DataFrame({"bucket": rs.index, "type": typ, "amount": rs["sum"].round(2), "n": rs["count"]}))
+    return pd.concat(out).sort_values(["bucket", "type"]).reset_index(drop=True)
+
+@pytest.mark.parametrize("resolution", list(RULES))
+@pytest.mark.parametrize("start,end", [("2024-01-01", "2025-12-31"), ("2024-12-30", "2025-03-31")])
+def test_trend_matches_pandas_resample(repo, resolution, start, end):
+    for date, amount, cat, typ in ROWS:
+        assert repo.add_trans(date, "x", amount, category_id(repo, cat), typ, allow_duplicate=True)[0]
+    got = repo.trend(start, end, None, None, resolution=resolution)
+    got = got.sort_values(["bucket", "type"]).reset_index(drop=True)
+    want = _expected(start, end, resolution)
+    assert got["bucket"].dt.strftime("%Y-%m-%d").tolist() == want["bucket"].dt.strftime("%Y-%m-%d").tolist()
+    assert got["type"].tolist() == want["type"].tolist()
+    assert got["amount"].tolist() == pytest.approx(want["amount"].tolist())
+    assert got["n"].tolist() == want["n"].tolist()
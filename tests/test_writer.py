@@ -0,0 +1,51 @@
+import threading
+import pytest
+from conftest import category_id
+from finance.importer import Importer
+
+def _count(repo) -> int:
+    with repo.db.connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions;").fetchone()[0]
+
+def _insert(conn, cat: int, cents: int = 100):
+    conn.execute("INSERT INTO transactions (date, description, amount_cents, category_id, type) "
+                 "VALUES ('2025-01-01', 'x', ?, ?, 'EXPENSE');", (cents, cat))
+
+def test_failed_lone_job_is_rolled_back(repo):
+    rent = category_id(repo, "Rent")
+    def job(conn):
+        _insert(conn, rent)
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        repo.writer.call(job)
+    assert _count(repo) == 0
+
+def test_failed_job_in_a_batch_leaves_the_others(repo):
+    rent = category_id(repo, "Rent")
+    gate = threading.Event()
+    blocker = repo.writer.submit(lambda conn: gate.wait(5))
+    good = repo.writer.submit(lambda conn: _insert(conn, rent))
+    bad = repo.writer.submit(lambda conn: (_insert(conn, rent), _insert(conn, rent, cents=-1)))
+    gate.set()
+    blocker.result(5); good.result(5)
+    with pytest.raises(Exception):
+        bad.result(5)
+    assert _count(repo) == 1
+
+def test_imports_go_through_the_writer(repo, tmp_path):
+    src = tmp_path / "s.csv"
+    src.write_text("date,amount,category\n2025-01-01,-5,Dining\n2025-01-02,-6,Dining\n")
+    before = repo.writer.stats()["committed"]
+    assert Importer(repo).import_file(str(src)).inserted == 2
+    assert repo.writer.stats()["committed"] == before + 1
+
+def test_timed_out_write_is_never_committed(repo):
+    rent = category_id(repo, "Rent")
+    gate = threading.Event()
+    blocker = repo.writer.submit(lambda conn: gate.wait(5))
+    with pytest.raises(TimeoutError):
+        repo.writer.call(lambda conn: _insert(conn, rent), timeout=0.1)
+    gate.set()
+    blocker.result(5)
+    repo.writer.call(lambda conn: None)  # the queue has drained past the cancelled job
+    assert _count(repo) == 0
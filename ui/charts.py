@@ -1,52 +1,148 @@
+import io
+import hashlib
+import threading
 import datetime as dt
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
 import streamlit as st
-from finance.config import YELLOW_COLORS
+from finance.config import (YELLOW_COLORS, CHART_CACHE_SIZE, CHART_WORKERS, CHART_DPI, CHART_HEATMAP_ROWS,
+                            CHART_TREND_POINTS)
+from finance.budget import BudgetMatrix
+from finance.cache import LRUCache
+from finance.metrics import timed, register_source
 
-def pie_category(df: pd.DataFrame):
-    ex = df[df["type"]=="EXPENSE"]
+# Rendered PNGs keyed by a fingerprint of the plotted data. Figures are built with the
+# OO API (no pyplot registry), rasterized on Agg in a small worker pool, and dropped
+# as soon as the bytes are written.
+_PNG_CACHE = LRUCache(CHART_CACHE_SIZE)
+_POOL = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="chart")
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def fingerprint(name: str, data: pd.DataFrame, *args) -> str:
+    h = hashlib.sha1(name.encode())
+    # the index is part of the picture (the heatmap's category labels are its index)
+    h.update(repr((list(data.columns), data.shape, args)).encode())
+    h.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return h.hexdigest()
+
+def _rasterize(draw: Callable, figsize: Tuple[float, float], data: pd.DataFrame, *args) -> bytes:
+    fig = Figure(figsize=figsize, dpi=CHART_DPI)
+    try:
+        draw(fig, data, *args)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        return buf.getvalue()
+    finally:
+        fig.clear()
+
+def render_png(draw: Callable, figsize: Tuple[float, float], data: pd.DataFrame, *args) -> bytes:
+    key = fingerprint(draw.__name__, data, figsize, *args)
+    png = _PNG_CACHE.get(key, None)
+    if png is not None:
+        return png
+    with _INFLIGHT_LOCK:
+        # concurrent sessions asking for the same chart share one render
+        fut = _INFLIGHT.get(key)
+        if fut is None:
+            fut = _INFLIGHT[key] = _POOL.submit(_rasterize, draw, figsize, data, *args)
+    try:
+        png = fut.result()
+        _PNG_CACHE.put(key, png)
+        return png
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+def chart_cache_stats() -> Dict:
+    return _PNG_CACHE.stats()
+
+register_source("charts:png_cache", chart_cache_stats)  # listed with the workers in the Debug panel
+
+def _draw_pie(fig: Figure, ex: pd.DataFrame):
+    ax = fig.subplots()
+    colors = (YELLOW_COLORS * ((len(ex)//len(YELLOW_COLORS))+1))[:len(ex)]
+    ax.pie(ex["amount"].values, labels=ex["category"].values, autopct="%1.1f%%", startangle=90, colors=colors)
+    ax.axis("equal")
+
+@timed("chart.pie_category")
+def pie_category(by_cat: pd.DataFrame):
+    ex = by_cat.loc[by_cat["type"]=="EXPENSE", ["category","amount"]]
     if ex.empty:
         st.info("No expense data to plot."); return
-    by_cat = ex.groupby("category")["amount"].sum().sort_values(ascending=False)
-    fig, ax = plt.subplots(figsize=(4.5,4.5))
-    colors = (YELLOW_COLORS * ((len(by_cat)//len(YELLOW_COLORS))+1))[:len(by_cat)]
-    ax.pie(by_cat.values, labels=by_cat.index, autopct="%1.1f%%", startangle=90, colors=colors)
-    ax.axis("equal")
-    st.pyplot(fig)
+    st.image(render_png(_draw_pie, (4.5,4.5), ex))
 
-def monthly_trend(df: pd.DataFrame):
-    if df.empty:
-        st.info("No data to plot."); return
-    tmp = df.copy()
-    tmp["month"] = pd.to_datetime(tmp["date"]).values.astype("datetime64[M]")
-    g = tmp.groupby(["month","type"])["amount"].sum().reset_index()
-    fig, ax = plt.subplots(figsize=(7,4))
+def downsample(trend: pd.DataFrame, points: int = CHART_TREND_POINTS) -> pd.DataFrame:
+    # at most `points` rows per type: longer series are cut into points/2 bins and each bin
+    # keeps its lowest and highest bucket, so spikes survive; rows stay in time order
+    parts = []
+    for _, sub in trend.groupby("type", sort=False):
+        if len(sub) <= points:
+            parts.append(sub); continue
+        bins = pd.Series(sub["amount"].to_numpy()).groupby(np.arange(len(sub)) * (points // 2) // len(sub))
+        parts.append(sub.iloc[np.union1d(bins.idxmin().to_numpy(), bins.idxmax().to_numpy())])
+    return pd.concat(parts, ignore_index=True) if parts else trend
+
+def _draw_trend(fig: Figure, trend: pd.DataFrame, resolution: str):
+    ax = fig.subplots()
     for typ in ("INCOME","EXPENSE"):
-        sub = g[g["type"]==typ]
+        sub = trend[trend["type"]==typ]
         if not sub.empty:
-            ax.plot(sub["month"], sub["amount"], marker="o", label=typ)
-    ax.set_xlabel("Month"); ax.set_ylabel("Amount"); ax.legend(); ax.grid(True, alpha=0.3)
-    st.pyplot(fig)
-
-def actual_budget(df: pd.DataFrame, budgets: pd.DataFrame, for_month: dt.date):
-    if budgets.empty:
-        st.info("No budgets configured."); return
-    start = for_month.replace(day=1)
-    end = (start + pd.offsets.MonthEnd(0)).date()
-    month_df = df[(df["type"]=="EXPENSE") & (df["date"]>=start) & (df["date"]<=end)]
-    actual_by_cat = month_df.groupby("category")["amount"].sum() if not month_df.empty else pd.Series(dtype=float)
-
-    plot_df = budgets[budgets["type"]=="EXPENSE"][["category","monthly_limit"]].copy()
-    plot_df["actual"] = plot_df["category"].map(actual_by_cat).fillna(0.0)
-    if plot_df.empty:
-        st.info("No expense budgets configured."); return
+            ax.plot(sub["bucket"], sub["amount"], marker="o" if len(sub) <= 60 else None, label=typ)
+    ax.set_xlabel(resolution.capitalize()); ax.set_ylabel("Amount"); ax.legend(); ax.grid(True, alpha=0.3)
+    fig.autofmt_xdate()
 
-    fig, ax = plt.subplots(figsize=(7,4))
+@timed("chart.trend")
+def trend_chart(trend: pd.DataFrame, resolution: str, native: bool = False):
+    # trend is FinanceRep.trend(...) at `resolution`; native draws it with st.line_chart (Vega-Lite)
+    if trend.empty:
+        st.info("No data to plot."); return
+    data = downsample(trend[["bucket","type","amount"]])
+    if native:
+        st.line_chart(data, x="bucket", y="amount", color="type", x_label=resolution.capitalize(), y_label="Amount")
+    else:
+        st.image(render_png(_draw_trend, (7,4), data, resolution))
+
+def _draw_budget(fig: Figure, plot_df: pd.DataFrame, for_month: dt.date):
+    ax = fig.subplots()
     x = range(len(plot_df))
     ax.bar(x, plot_df["monthly_limit"], label="Budget", alpha=0.6, edgecolor="#eab308")
     ax.bar(x, plot_df["actual"], label="Actual", alpha=0.9, edgecolor="#b45309")
     ax.set_xticks(list(x)); ax.set_xticklabels(plot_df["category"], rotation=20, ha="right")
     ax.set_ylabel("Amount"); ax.set_title(f"Budget vs Actual — {for_month.strftime('%B %Y')}")
     ax.legend(); ax.grid(axis="y", alpha=0.3)
-    st.pyplot(fig)
+
+@timed("chart.actual_budget")
+def actual_budget(plot_df: pd.DataFrame, for_month: dt.date):
+    if plot_df.empty:
+        st.info("No expense budgets configured."); return
+    st.image(render_png(_draw_budget, (7,4), plot_df[["category","monthly_limit","actual"]], for_month))
+
+def _draw_heatmap(fig: Figure, ratio: pd.DataFrame):
+    ax = fig.subplots()
+    im = ax.imshow(ratio.to_numpy(), aspect="auto", cmap="RdYlGn_r", vmin=0, vmax=2, interpolation="nearest")
+    step = max(1, -(-len(ratio.columns) // 12))  # at most ~12 month labels
+    ax.set_xticks(range(0, len(ratio.columns), step))
+    ax.set_xticklabels([m.strftime("%b %Y") for m in ratio.columns[::step]], rotation=30, ha="right")
+    ax.set_yticks(range(len(ratio.index))); ax.set_yticklabels(ratio.index, fontsize=8)
+    fig.colorbar(im, ax=ax, label="Actual / budget")
+
+@timed("chart.budget_heatmap")
+def budget_heatmap(budgets: BudgetMatrix):
+    ratio = budgets.adherence()
+    if ratio.empty or not len(ratio.columns):
+        st.info("No expense budgets configured."); return
+    # adherence() is months × categories; drawn transposed, one row per category (sorted by its
+    # worst month's ratio, top CHART_HEATMAP_ROWS) and one column per month in date order.
+    # 0 = nothing spent, 1 = exactly on budget, ≥2 = double
+    worst = ratio.max(axis=0, skipna=True).fillna(0).sort_values(ascending=False, kind="stable")
+    shown = ratio[worst.index[:CHART_HEATMAP_ROWS]].T
+    st.image(render_png(_draw_heatmap, (7, 1.5 + 0.25 * len(shown)), shown))
+    st.caption(f"Within budget in {budgets.within_share():.0%} of category-months"
+               + (f" · showing the {len(shown)} categories most over budget of {len(ratio.columns)}"
+                  if len(ratio.columns) > len(shown) else ""))
@@ -1,6 +1,7 @@
 import datetime as dt
 import streamlit as st
 from finance.repository import FinanceRep
+from finance.importer import Importer
 
 def ai_api_key():
     st.subheader("Gemini API Key")
@@ -70,14 +71,28 @@ def menu_add_trans(repo: FinanceRep):
         selected_name = st.selectbox("Category", name_options, key="txn_category_add")
         cat_id = id_map[selected_name] if selected_name else None
 
+    allow_dup = st.checkbox("Add even if it's a duplicate", key="txn_allow_dup",
+                            help="Same date, amount, type, category and description as an existing transaction.")
     if st.button("Add", use_container_width=True, type="primary", disabled=(cat_id is None), key="add_txn_btn"):
-        ok, msg = repo.add_trans(date, desc, float(amount), cat_id, typ)
+        ok, msg = repo.add_trans(date, desc, float(amount), cat_id, typ, allow_duplicate=allow_dup)
         st.success(msg) if ok else st.error(msg)
         if ok: st.rerun()
 
+def menu_import(repo: FinanceRep):
+    st.subheader("Import Statement")
+    upload = st.file_uploader("Bank export (CSV or OFX)", type=["csv","ofx","qfx"], key="import_file")
+    if st.button("Import", use_container_width=True, disabled=(upload is None), key="import_btn"):
+        with st.spinner("Importing..."):
+            report = Importer(repo).import_file(upload)
+        st.success(report.summary()) if report.inserted or report.duplicates else st.error(report.summary())
+        if report.rejects:
+            st.dataframe([{"Line": int(l), "Reason": r} for l, r in report.rejects], use_container_width=True, height=160)
+
 def render_menu(repo: FinanceRep, service, ai):
     menu_add_trans(repo)
     st.markdown("---")
+    menu_import(repo)
+    st.markdown("---")
     menu_add_category(repo)
     st.markdown("---")
     menu_add_budget(repo)
@@ -1,15 +1,21 @@
+import json
+import time
 import datetime as dt
 import streamlit as st
 import pandas as pd
 from typing import Optional, List, Tuple
 from finance.repository import FinanceRep
+from finance.models import Transaction
 from finance.services import FinanceService
 from finance.ai import AiService
-from ui.charts import pie_category, monthly_trend, actual_budget
+from finance.config import PROFILE_PORT, CHART_TREND_RENDERER
+from finance.metrics import Run, RECORDER
 
-def show_filters(repo: FinanceRep) -> Tuple[str, str, Optional[str], List[int]]:
+Filters = Tuple[str, str, Optional[str], List[int]]
+
+def show_filters(repo: FinanceRep) -> Tuple[Filters, Optional[str]]:
     st.subheader("Filters")
-    c1, c2, c3 = st.columns([1,1,2])
+    c1, c2, c3, c4 = st.columns([1,1,1,2])
     with c1:
         start = st.text_input("Start date (YYYY-MM-DD)", value=(dt.date.today()-dt.timedelta(days=90)).isoformat(), key="f_start")
     with c2:
@@ -17,16 +23,19 @@ def show_filters(repo: FinanceRep) -> Tuple[str, str, Optional[str], List[int]]:
     with c3:
         typ = st.selectbox("Type", ["All","EXPENSE","INCOME"], index=0, key="f_type")
         typ = None if typ=="All" else typ
+    with c4:
+        search = st.text_input("Search descriptions", key="f_search", placeholder='uber*  "coffee shop"',
+                               help='Words must all appear; end a word with * to match a prefix; quote a phrase.')
     cats = repo.list_categories()
     cat_choices: List[int] = []
     if not cats.empty:
         cat_map = {f"{r['name']} ({r['type']}) [id:{r['id']}]": int(r["id"]) for _,r in cats.iterrows()}
         selected = st.multiselect("Categories", list(cat_map.keys()), key="f_cats")
         cat_choices = [cat_map[s] for s in selected]
-    return start, end, typ, cat_choices
+    return (start, end, typ, cat_choices), (search.strip() or None)
 
-def display_kpis(service: FinanceService, df: pd.DataFrame):
-    income, expense, net = service.kpis(df)
+def display_kpis(service: FinanceService, filters: Filters):
+    income, expense, net = service.kpis(*filters)
     c1, c2, c3 = st.columns(3)
     with c1:
         st.markdown('<div class="metric-box"><div class="kpi-title">Total Income</div>'
@@ -39,12 +48,12 @@ def display_kpis(service: FinanceService, df: pd.DataFrame):
         st.markdown(f'<div class="metric-box"><div class="kpi-title">Net</div>'
                     f'<div class="kpi-value {cls}">{net:,.2f}</div></div>', unsafe_allow_html=True)
 
-def show_finance_insights(service: FinanceService, df: pd.DataFrame):
+def show_finance_insights(service: FinanceService, filters: Filters):
   
-    if df.empty:
+    data = service.finance_insights(*filters)
+    if not data["count"]:
         return
 
-    data = service.finance_insights(df)
     savings_line = ""
     if data["savings_rate"] is not None:
         savings_line = f"<p><b>Savings rate:</b> {data['savings_rate']:.1f}%</p>"
@@ -55,9 +64,10 @@ def show_finance_insights(service: FinanceService, df: pd.DataFrame):
             [f"{c} ({amt:,.0f})" for c, amt in data["top_expenses"]]
         ) + "</p>"
 
-    if data["over_msgs"]:
+    if data["over_msgs"] or data["pace_msgs"]:
         over_items = "".join(
             [f"<li class='bad small'>{m.replace('**','')}</li>" for m in data["over_msgs"]]
+            + [f"<li class='neutral small'>{m.replace('**','')}</li>" for m in data["pace_msgs"]]
         )
         over_html = f"<ul>{over_items}</ul>"
     else:
@@ -74,69 +84,182 @@ def show_finance_insights(service: FinanceService, df: pd.DataFrame):
     st.markdown(html, unsafe_allow_html=True)
 
 
-def all_tabs(repo: FinanceRep, service: FinanceService, ai: AiService, df: pd.DataFrame):
-    t1, t2, t3 = st.tabs(["Charts", " Transactions", " AI Advice"])
-
-    with t1:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("**Category Spend Expenses**")
-            pie_category(df)
-        with c2:
-            st.markdown("**Monthly Trend Income vs Expense**")
-            monthly_trend(df)
-        st.markdown("---")
-        st.markdown("**This Month Budget vs Actual**")
-        budgets = repo.get_budgets()
-        month = dt.date.today().replace(day=1)
-        actual_budget(df, budgets, month)
-
-    with t2:
-        st.subheader("Transactions")
-        if df.empty:
-            st.info("No transactions found for the selected filters.")
-        else:
-            show = df.rename(columns={"id":"ID","date":"Date","description":"Description","amount":"Amount","category":"Category","type":"Type"})
-            st.dataframe(show[["ID","Date","Type","Category","Description","Amount"]], use_container_width=True)
-
-            with st.expander("Edit / Delete"):
-                txn_ids = df["id"].tolist()
-                chosen = st.selectbox("Pick a transaction to edit/delete (by ID)", txn_ids, key="edit_pick")
-                row = df[df["id"]==chosen].iloc[0]
-
-                e1, e2 = st.columns(2)
-                with e1:
-                    date = st.text_input("Date", value=str(row["date"]), key="edit_date")
-                    description = st.text_input("Description", value=row["description"] or "", key="edit_desc")
-                    amount = st.number_input("Amount", value=float(row["amount"]), min_value=0.01, step=1.0, key="edit_amount")
-                with e2:
-                    typ = st.selectbox("Type", ["EXPENSE","INCOME"], index=0 if row["type"]=="EXPENSE" else 1, key=f"edit_type_{int(chosen)}")
-                    cats = repo.list_categories(typ)
-                    cat_label = f"{row['category']} (id:{row['category_id']})"
-                    options = [f"{r['name']} (id:{r['id']})" for _,r in cats.iterrows()] or [cat_label]
-                    new_cat = st.selectbox("Category", options, index=options.index(cat_label) if cat_label in options else 0, key=f"edit_category_{int(chosen)}")
-                    new_cat_id = int(new_cat.split("id:")[-1].strip(")"))
-
-                colb1, colb2, _ = st.columns([1,1,4])
-                if colb1.button("Update", type="primary", key="edit_update"):
-                    ok, msg = repo.update_trans(int(chosen), date, description, float(amount), new_cat_id, typ)
-                    st.success(msg) if ok else st.error(msg)
-                    if ok: st.rerun()
-                if colb2.button("Delete", type="secondary", key="edit_delete"):
-                    repo.delete_trans(int(chosen))
-                    st.warning("Transaction deleted.")
-                    st.rerun()
-
-
-        if not df.empty:
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Export CSV", data=csv, file_name="transactions.csv", mime="text/csv")
-
-    with t3:
-        st.markdown("**Generate concise budgeting suggestions based on your recent data.**")
-        months = st.slider("Summarize roughly how many months?", min_value=1, max_value=12, value=3, key="ai_months")
-        if st.button("Get AI Advice", type="primary", key="ai_btn"):
-            prompt = ai.make_prompt(df, months, service)
-            with st.spinner("Getting tips..."):
-                advice = ai.get_advice(prompt)
-            st.markdown(advice)
+def transactions_page(repo: FinanceRep, filters: Filters, search: Optional[str] = None) -> Optional[pd.DataFrame]:
+    income, expense, total = repo.totals(*filters, search=search)
+    if not total:
+        st.info("No transactions found for the selected filters.")
+        return None
+    s1, s2 = st.columns([1,3])
+    size = s1.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="txn_page_size")
+    if search:
+        ranked = s2.radio("Order", ["Newest first", "Best match"], horizontal=True, key="txn_order") == "Best match"
+        st.caption(f"{total:,} match(es) for “{search}” · income {income:,.2f} · expenses {expense:,.2f}")
+        if ranked:
+            page = repo.search(search, *filters, limit=size)
+            show_trans(page)
+            return page
+    # stack of keyset cursors, one per page already visited; reset when the filters change
+    sig = (filters[0], filters[1], filters[2], tuple(filters[3]), search, size)
+    if st.session_state.get("txn_page_sig") != sig:
+        st.session_state["txn_page_sig"] = sig
+        st.session_state["txn_cursors"] = [None]
+    cursors = st.session_state["txn_cursors"]
+
+    page = repo.get_trans_page(*filters, after=cursors[-1], limit=size + 1, search=search)
+    has_more = len(page) > size
+    page = page.head(size)
+    first = (len(cursors)-1)*size
+    show_trans(page)
+
+    p1, p2, p3 = st.columns([1,1,4])
+    if p1.button("← Newer", disabled=len(cursors) == 1, key="txn_prev"):
+        cursors.pop(); st.rerun()
+    if p2.button("Older →", disabled=not has_more, key="txn_next"):
+        last = page.iloc[-1]
+        cursors.append((last["date"].isoformat(), int(last["id"]))); st.rerun()
+    p3.caption(f"Rows {first+1:,}–{first+len(page):,} of {total:,}")
+    return page
+
+def show_trans(page: pd.DataFrame):
+    show = page.rename(columns={"id":"ID","date":"Date","description":"Description","amount":"Amount","category":"Category","type":"Type"})
+    st.dataframe(show[["ID","Date","Type","Category","Description","Amount"]], use_container_width=True, hide_index=True)
+
+def edit_trans(repo: FinanceRep, row: Transaction):
+    e1, e2 = st.columns(2)
+    with e1:
+        date = st.text_input("Date", value=row.date.isoformat(), key="edit_date")
+        description = st.text_input("Description", value=row.description or "", key="edit_desc")
+        amount = st.number_input("Amount", value=float(row.amount), min_value=0.01, step=1.0, key="edit_amount")
+    with e2:
+        typ = st.selectbox("Type", ["EXPENSE","INCOME"], index=0 if row.type=="EXPENSE" else 1, key=f"edit_type_{row.id}")
+        cats = repo.list_categories(typ)
+        options = [f"{r['name']} (id:{r['id']})" for _,r in cats.iterrows()] or [f"(id:{row.category_id})"]
+        current = next((i for i, o in enumerate(options) if o.endswith(f"(id:{row.category_id})")), 0)
+        new_cat = st.selectbox("Category", options, index=current, key=f"edit_category_{row.id}")
+        new_cat_id = int(new_cat.split("id:")[-1].strip(")"))
+
+    colb1, colb2, _ = st.columns([1,1,4])
+    if colb1.button("Update", type="primary", key="edit_update"):
+        ok, msg = repo.update_trans(row.id, date, description, float(amount), new_cat_id, typ)
+        st.success(msg) if ok else st.error(msg)
+        if ok: st.rerun()
+    if colb2.button("Delete", type="secondary", key="edit_delete"):
+        repo.delete_trans(row.id)
+        st.warning("Transaction deleted.")
+        st.rerun()
+
+def export_button(repo: FinanceRep, filters: Filters, search: Optional[str]):
+    # nothing is read until the download is requested; rows are streamed from the database
+    from finance.export import FORMATS, available_formats, export_file
+    e1, e2 = st.columns([1,3])
+    fmt = e1.selectbox("Export format", available_formats(), key="export_fmt", label_visibility="collapsed")
+    mime, ext = FORMATS[fmt]
+    name = f"transactions.{ext}"
+    try:
+        e2.download_button("⬇️ Export", data=lambda: export_file(repo, fmt, *filters, search=search),
+                           file_name=name, mime=mime, on_click="ignore", key="export_btn")
+    except TypeError:
+        # Streamlit without deferred downloads rejects callable data: build the bytes on a
+        # click, then offer them (anything else is a real error and propagates)
+        if e2.button("⬇️ Prepare export", key="export_prepare"):
+            st.session_state["export_file"] = (fmt, filters, search, export_file(repo, fmt, *filters, search=search))
+        prepared = st.session_state.get("export_file")
+        if prepared and prepared[:3] == (fmt, filters, search):
+            e2.download_button("Download", data=prepared[3], file_name=name, mime=mime, key="export_download")
+
+def lazy_tabs(labels: List[str], key: str):
+    # with on_change="rerun" only the selected tab's body needs to run; older Streamlit runs them all
+    try:
+        tabs = st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        tabs = st.tabs(labels)
+    return [(tab, getattr(tab, "open", None) is not False) for tab in tabs]
+
+RESOLUTIONS = {"Auto": None, "Daily": "day", "Weekly": "week", "Monthly": "month", "Yearly": "year"}
+
+def trend_panel(repo: FinanceRep, filters: Filters):
+    # bucket size follows the date range unless picked; bucketed in SQLite either way
+    from ui.charts import trend_chart
+    h1, h2, h3 = st.columns([2,1,1])
+    pick = h2.selectbox("Resolution", list(RESOLUTIONS), key="trend_res", label_visibility="collapsed")
+    native = h3.toggle("Interactive", value=CHART_TREND_RENDERER == "native", key="trend_native")
+    resolution = RESOLUTIONS[pick] or repo.trend_resolution(filters[0], filters[1])
+    label = {"day": "Daily", "week": "Weekly", "month": "Monthly", "year": "Yearly"}[resolution]
+    h1.markdown(f"**{label} Trend Income vs Expense**")
+    trend_chart(repo.trend(*filters, resolution=resolution), resolution, native)
+
+def all_tabs(repo: FinanceRep, service: FinanceService, ai: AiService, filters: Filters, search: Optional[str] = None):
+    (t1, charts_open), (t2, txns_open), (t3, ai_open) = lazy_tabs(["Charts", " Transactions", " AI Advice"], key="main_tab")
+
+    if charts_open:
+        # matplotlib is imported on the first chart view, not at startup
+        from ui.charts import pie_category, actual_budget, budget_heatmap
+        with t1:
+            c1, c2 = st.columns(2)
+            with c1:
+                st.markdown("**Category Spend Expenses**")
+                pie_category(repo.by_category(*filters))
+            with c2:
+                trend_panel(repo, filters)
+            st.markdown("---")
+            st.markdown("**This Month Budget vs Actual**")
+            month = dt.date.today().replace(day=1)
+            budgets = repo.budget_matrix(*filters)
+            actual_budget(budgets.month(month), month)
+            st.markdown("**Budget Adherence by Month**")
+            budget_heatmap(budgets)
+
+    if txns_open:
+        with t2:
+            st.subheader("Transactions")
+            page = transactions_page(repo, filters, search)
+            if page is not None:
+                with st.expander("Edit / Delete"):
+                    chosen = st.selectbox("Pick a transaction to edit/delete (by ID)", page["id"].tolist(), key="edit_pick")
+                    row = repo.get_trans_by_id(int(chosen))
+                    if row is None:
+                        st.info("Transaction no longer exists.")
+                    else:
+                        edit_trans(repo, row)
+                export_button(repo, filters, search)
+
+    if ai_open:
+        with t3:
+            st.markdown("**Generate concise budgeting suggestions based on your recent data.**")
+            months = st.slider("Summarize roughly how many months?", min_value=1, max_value=12, value=3, key="ai_months")
+            if st.button("Get AI Advice", type="primary", key="ai_btn"):
+                prompt = ai.make_prompt(service, months, *filters)
+                t0 = time.perf_counter()
+                st.write_stream(ai.stream_advice(prompt))
+                if ai.cache is not None:
+                    stats = ai.cache.stats()
+                    st.caption(f"Answered in {(time.perf_counter()-t0)*1000:,.0f} ms · advice cache hit rate {stats['hit_rate']:.0%} "
+                               f"({stats['hits']} hits) · {stats['lifetime_saved_ms']/1000:,.1f}s of model latency saved")
+
+def debug_panel(run: Optional[Run]):
+    if run is None:
+        return
+    calls, sql = run.frames()
+    sql_ms = sql["ms"].sum() if not sql.empty else 0.0
+    with st.expander(f"🛠 Debug · rerun {run.seconds()*1000:,.0f} ms · {len(calls)} calls · {len(sql)} SQL statements"):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Rerun", f"{run.seconds()*1000:,.0f} ms")
+        c2.metric("SQLite", f"{sql_ms:,.0f} ms")
+        c3.metric("DataFrames", f"{calls['bytes'].fillna(0).sum()/1e6:,.1f} MB" if not calls.empty else "0 MB")
+        if not calls.empty:
+            st.markdown("**Calls** (in order, nested calls indented)")
+            calls = calls.assign(call=["· " * d + c for d, c in zip(calls["depth"], calls["call"])])
+            st.dataframe(calls[["call", "at_ms", "ms", "rows", "bytes", "error"]], hide_index=True, use_container_width=True)
+        if not sql.empty:
+            st.markdown("**SQL by statement**")
+            by_stmt = (sql.groupby("sql", as_index=False)["ms"].agg(count="count", total_ms="sum", max_ms="max")
+                       .sort_values("total_ms", ascending=False))
+            st.dataframe(by_stmt, hide_index=True, use_container_width=True)
+        sources = RECORDER.snapshot()["sources"]
+        if sources:
+            st.markdown("**Workers and caches**")
+            st.dataframe(pd.DataFrame(sources).T, use_container_width=True)
+        payload = json.dumps({"rerun_ms": run.seconds()*1000, "calls": run.calls, "sql": run.sql})
+        st.download_button("Export run (JSON)", data=payload, file_name="rerun_profile.json", mime="application/json")
+        if PROFILE_PORT:
+            st.caption(f"Cumulative counters: http://127.0.0.1:{PROFILE_PORT}/metrics (Prometheus) · /metrics.json")